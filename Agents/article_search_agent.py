@@ -1,31 +1,125 @@
+from config import RETRIEVAL_K
+from langchain_core.runnables import RunnableConfig
 from logger_util import setup_logger
+from utils.chunk_refs import make_ref, runtime_from_config
+from utils.conversation_cache import new_terms
+from utils.metrics import cache_lookups
+from utils.references import extract_article_refs
 
 logger = setup_logger(__name__)
 
-def article_search_agent(state):
-    """Agent to search relevant constitutional articles using retriever."""
+
+def lookup_articles(article_index, query):
+    """Resolve explicit "Article N" references through the exact article index.
+
+    Returns ``(refs, unresolved)``; a clause reference such as "19(2)" falls
+    back to the whole article when the clause itself was not indexed.
+    """
+    refs, unresolved = [], []
+    for ref in extract_article_refs(query, clauses=True):
+        article_id = next((i for i in (ref, ref.split("(")[0]) if article_index.lookup(i) is not None), None)
+        if article_id is None:
+            unresolved.append(ref)
+        else:
+            refs.append(make_ref("article", article_id))
+    return refs, unresolved
+
+
+def record_lookup(conversation, outcome):
+    conversation.record(outcome)
+    result = "miss" if outcome == "misses" else outcome
+    cache_lookups.inc(cache="conversation", result=result)
+    logger.info(f"Conversation cache {result}; stats: {conversation.stats()}")
+
+
+async def extend_follow_up(runtime, conversation, session_id, turn, query):
+    """Chunk set for a follow-up: the session's last one, plus a small dense search when it adds new terms."""
+    topic, refs = turn
+    terms = new_terms(query)
+    if not terms:
+        record_lookup(conversation, "reused")
+        logger.info(f"Follow-up reuses the session's {len(refs)} retrieved references.")
+        return refs
+
+    docs = await runtime.vectorstore.asimilarity_search(f"{topic} {' '.join(terms)}", k=RETRIEVAL_K)
+    seen = {(ref["kind"], ref["id"]) for ref in refs}
+    added = [
+        make_ref("chunk", chunk_id) for chunk_id in (doc.metadata.get("chunk_id", doc.id) for doc in docs)
+        if ("chunk", chunk_id) not in seen
+    ]
+    # New material first: it answers what the follow-up adds
+    refs = (added + refs)[:conversation.max_chunks]
+    conversation.put(session_id, topic, refs)
+    record_lookup(conversation, "extended")
+    logger.info(f"Follow-up extends the session's references with {len(added)} chunks for {terms}.")
+    return refs
+
+
+async def article_search_agent(state, config: RunnableConfig = None):
+    """Agent to search relevant constitutional articles using retriever.
+
+    Within a session, follow-up queries reuse or extend the previous turn's
+    references from the runtime's conversation cache instead of searching
+    from scratch.
+    """
     logger.info("Article Search Agent invoked.")
 
     query = state.get("query", "")
-    retriever = state.get("retriever")
-
-    if not retriever:
-        logger.error("Retriever not found in state. Cannot perform article search.")
-        state["relevant_articles"] = []
-        return state
+    runtime = runtime_from_config(config)
+    session_id = ((config or {}).get("configurable") or {}).get("thread_id")
+    conversation = getattr(runtime, "conversation_cache", None) if session_id is not None else None
 
     logger.debug(f"Query received for article search: '{query}'")
 
+    turn = conversation.follow_up_turn(session_id, query) if conversation is not None else None
+    if turn is not None:
+        try:
+            return {"relevant_articles": await extend_follow_up(runtime, conversation, session_id, turn, query)}
+        except Exception:
+            logger.exception(f"Error while extending follow-up references for query: {query}")
+
+    relevant_articles, error = await search_articles(runtime, query)
+    if error is not None:
+        return {"relevant_articles": relevant_articles, "errors": [f"article_search: {error}"]}
+    if conversation is not None:
+        conversation.put(session_id, query, relevant_articles)
+        record_lookup(conversation, "misses")
+    # Only return this agent's keys so parallel branches never collide on state.
+    return {"relevant_articles": relevant_articles}
+
+
+async def search_articles(runtime, query):
+    """Direct article lookups, completed by the retriever when the query is not fully answered by them.
+
+    Returns ``(refs, error)``; on a retriever failure ``refs`` holds the direct lookups only.
+    """
+    retriever = getattr(runtime, "retriever", None)
+    article_index = getattr(runtime, "article_index", None)
+
+    direct_articles, unresolved = [], []
+    if article_index is not None:
+        direct_articles, unresolved = lookup_articles(article_index, query)
+        if direct_articles:
+            logger.info(f"Resolved {len(direct_articles)} article references by direct lookup.")
+        if direct_articles and not unresolved:
+            return direct_articles, None
+
+    if not retriever:
+        logger.error("Retriever not found in the runtime. Cannot perform article search.")
+        return direct_articles, "retriever not available"
+
     try:
-        docs = retriever.invoke(query)
-        relevant_articles = [doc.page_content for doc in docs]
-        state["relevant_articles"] = relevant_articles
+        docs = await retriever.ainvoke(query)
+        # Only the chunk ID and score are kept; the synthesizer re-reads the text
+        relevant_articles = direct_articles + [
+            make_ref("chunk", doc.metadata.get("chunk_id", doc.id), score=doc.metadata.get("score"))
+            for doc in docs
+        ]
 
         logger.info(f"Found {len(relevant_articles)} relevant articles.")
-        if len(relevant_articles) > 0:
-            logger.debug(f"Sample article snippet: {relevant_articles[0][:200]}...")
+        if relevant_articles:
+            logger.debug(f"Top article reference: {relevant_articles[0]}")
     except Exception as e:
         logger.exception(f"Error while retrieving articles for query: {query}")
-        state["relevant_articles"] = []
-
-    return state
+        return direct_articles, str(e)
+    return relevant_articles, None
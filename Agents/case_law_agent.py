@@ -1,25 +1,31 @@
+from config import CASE_LAW_TOP_K, CASE_LAW_MIN_SIMILARITY
+from langchain_core.runnables import RunnableConfig
 from logger_util import setup_logger
+from utils.chunk_refs import make_ref, runtime_from_config
 
 logger = setup_logger(__name__)
 
-def case_law_agent(state):
-    """Agent to retrieve relevant case law based on query keywords."""
+async def case_law_agent(state, config: RunnableConfig = None):
+    """Agent to retrieve relevant case law from the local case-law store."""
     logger.info("Case Law Agent invoked.")
 
     query = state.get("query", "")
+    case_store = getattr(runtime_from_config(config), "case_store", None)
     logger.debug(f"Query received for case law search: '{query}'")
 
     try:
-        if "privacy" in query.lower() or "puttaswamy" in query.lower():
-            state["relevant_cases"] = [
-                "K.S. Puttaswamy v. Union of India (2017) - Right to Privacy under Article 21."
-            ]
-            logger.info("Found relevant case law on privacy.")
+        if case_store is None:
+            logger.warning("Case-law store is not available.")
+            relevant_cases = []
         else:
-            state["relevant_cases"] = []
-            logger.info("No relevant case law found for this query.")
+            ranked = await case_store.arank(query, k=CASE_LAW_TOP_K, min_similarity=CASE_LAW_MIN_SIMILARITY)
+            relevant_cases = [make_ref("case", case, score=score) for case, score in ranked]
+            if relevant_cases:
+                logger.info(f"Found {len(relevant_cases)} relevant cases.")
+            else:
+                logger.info("No relevant case law found for this query.")
     except Exception as e:
         logger.exception(f"Error while processing case law agent for query: {query}")
-        state["relevant_cases"] = []
+        return {"relevant_cases": [], "errors": [f"case_law: {e}"]}
 
-    return state
+    return {"relevant_cases": relevant_cases}
@@ -1,25 +1,32 @@
+from config import HISTORY_MAX_EVENTS
+from langchain_core.runnables import RunnableConfig
 from logger_util import setup_logger
+from utils.chunk_refs import make_ref, runtime_from_config
 
 logger = setup_logger(__name__)
 
-def historical_context_agent(state):
+async def historical_context_agent(state, config: RunnableConfig = None):
     """Agent to provide historical context for constitutional amendments or articles."""
     logger.info("Historical Context Agent invoked.")
 
     query = state.get("query", "")
+    timeline = getattr(runtime_from_config(config), "timeline", None)
     logger.debug(f"Query received for historical context: '{query}'")
 
     try:
-        if "article 370" in query.lower() or "abrogated" in query.lower():
-            state["historical_context"] = [
-                "Article 370 was a temporary provision for Jammu and Kashmir, abrogated on August 5, 2019."
-            ]
-            logger.info("Found historical context for Article 370.")
+        if timeline is None:
+            logger.warning("Amendment timeline is not available.")
+            historical_context = []
         else:
-            state["historical_context"] = []
-            logger.info("No relevant historical context found for this query.")
+            historical_context = [
+                make_ref("event", position) for position in timeline.search_positions(query, limit=HISTORY_MAX_EVENTS)
+            ]
+            if historical_context:
+                logger.info(f"Found {len(historical_context)} historical events.")
+            else:
+                logger.info("No relevant historical context found for this query.")
     except Exception as e:
         logger.exception(f"Error in historical context agent for query: {query}")
-        state["historical_context"] = []
+        return {"historical_context": [], "errors": [f"historical_context: {e}"]}
 
-    return state
+    return {"historical_context": historical_context}
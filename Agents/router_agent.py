@@ -1,39 +1,90 @@
-from config import llm
+import logging
+from config import get_llm, ROUTER_LOCAL_CONFIDENCE
 from logger_util import setup_logger
-from graph_state import GraphState, router_parser
+from graph_state import GraphState, RouterOutput, router_parser
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableConfig
+from utils.chunk_refs import runtime_from_config
+from utils.local_router import local_router
 
 logger = setup_logger(__name__)
 
-def router_agent(state: GraphState):
+# Built once at import; the format instructions never change between calls.
+# The chain is composed on first use so importing this module never builds the LLM.
+ROUTER_PROMPT = PromptTemplate(
+    template="""Based on the user's query, determine which agents to activate.
+    Only respond with a JSON object that matches the schema: {format_instructions}
+
+    User Query: {query}
+    """,
+    input_variables=["query"],
+    partial_variables={"format_instructions": router_parser.get_format_instructions()}
+)
+# How often each tier produced the decision; "local" and "follow_up" count Groq calls saved.
+decision_sources = {"local": 0, "llm": 0, "follow_up": 0}
+_chain = None
+
+
+def _get_chain():
+    global _chain
+    if _chain is None:
+        _chain = ROUTER_PROMPT | get_llm() | router_parser
+    return _chain
+
+
+def follow_up_decision(query: str, config: RunnableConfig = None):
+    """Decision for a follow-up to the session's last retrieval, or ``None`` when the query stands on its own.
+
+    Follow-ups always go to article search, which reuses or extends the
+    session's references; explicit case or history vocabulary still adds
+    those agents.
+    """
+    session_id = ((config or {}).get("configurable") or {}).get("thread_id")
+    conversation = getattr(runtime_from_config(config), "conversation_cache", None)
+    if conversation is None or conversation.follow_up_turn(session_id, query) is None:
+        return None
+    flags = local_router.rule_flags(query) or {}
+    return RouterOutput(
+        route_to_article_search=True,
+        route_to_case_law=flags.get("route_to_case_law", False),
+        route_to_historical_context=flags.get("route_to_historical_context", False),
+        reasoning="Follow-up to the session's previous turn",
+    )
+
+
+async def router_agent(state: GraphState, config: RunnableConfig = None):
     print("---ROUTER AGENT: Analyzing Query---")
     query = state["query"]
 
     logger.info("Router Agent started")
     logger.debug(f"Received query: {query}")
 
-    prompt = PromptTemplate(
-        template="""Based on the user's query, determine which agents to activate.
-        Only respond with a JSON object that matches the schema: {format_instructions}
-
-        User Query: {query}
-        """,
-        input_variables=["query"],
-        partial_variables={"format_instructions": router_parser.get_format_instructions()}
-    )
-
     try:
-        chain = prompt | llm | router_parser
-        routing_decision = chain.invoke({"query": query})
+        routing_decision, source = follow_up_decision(query, config), "follow_up"
+        if routing_decision is None:
+            routing_decision, confidence = await local_router.aclassify(query)
+            source = "local"
+            if routing_decision is None or confidence < ROUTER_LOCAL_CONFIDENCE:
+                logger.debug(f"Local router confidence {confidence:.2f} below threshold; asking LLM")
+                routing_decision = await _get_chain().ainvoke({"query": query})
+                source = "llm"
+
+        decision_sources[source] += 1
         print(f"Routing Decision: {routing_decision.reasoning}")
-        logger.info("Routing decision successfully generated")
-        logger.debug(f"Routing decision reasoning: {routing_decision.reasoning}")
-        logger.debug(f"Routing decision object: {routing_decision.dict()}")
+        logger.info(
+            "Routing decision generated by %s router (local %d / follow-up %d / llm %d so far)",
+            source, decision_sources["local"], decision_sources["follow_up"], decision_sources["llm"],
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Routing decision reasoning: {routing_decision.reasoning}")
+            logger.debug(f"Routing decision object: {routing_decision.dict()}")
 
-        state["routing_decision"] = routing_decision.dict()
+        decision = dict(routing_decision.dict(), source=source)
     except Exception as e:
         logger.error(f"Error during routing decision: {e}", exc_info=True)
-        state["routing_decision"] = {"error": str(e)}
+        decision = {"error": str(e)}
 
     logger.info("Router Agent finished")
-    return state
+    if "error" in decision:
+        return {"routing_decision": decision, "errors": [f"router: {decision['error']}"]}
+    return {"routing_decision": decision}
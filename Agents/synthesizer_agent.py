@@ -1,23 +1,68 @@
-from config import llm
-from logger_util import setup_logger
+import asyncio
+import logging
+from config import get_llm, CONTEXT_TOKEN_BUDGET, CONTEXT_DEDUP_THRESHOLD
+from logger_util import setup_logger, truncate
+from utils.chunk_refs import ahydrate, runtime_from_config
+from utils.context_packer import count_tokens, pack_context
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableConfig
 
 logger = setup_logger(__name__)
 
-def synthesizer_agent(state):
+SYNTHESIZER_PROMPT = PromptTemplate(
+    template="""You are a helpful assistant answering queries about the Constitution of India.
+        Use the provided context to formulate a comprehensive and accurate answer.
+
+        Context:
+        {context}
+
+        Question: {query}
+
+        Final Answer:""",
+    input_variables=["context", "query"]
+)
+_chain = None
+
+
+def _get_chain():
+    """Prompt piped into the shared LLM, composed on first use and reused by every call."""
+    global _chain
+    if _chain is None:
+        _chain = SYNTHESIZER_PROMPT | get_llm()
+    return _chain
+
+
+async def synthesizer_agent(state, config: RunnableConfig = None):
     print("---SYNTHESIZER AGENT: Composing Final Answer---")
     query = state["query"]
 
     logger.info("Synthesizer Agent started")
     logger.debug(f"Received query: {query}")
 
-    relevant_articles = "\n".join(state.get("relevant_articles", []))
-    relevant_cases = "\n".join(state.get("relevant_cases", []))
-    historical_context = "\n".join(state.get("historical_context", []))
+    # Branches hand over references; the text is read only now, for packing
+    runtime = runtime_from_config(config)
+    articles, cases, history = await asyncio.gather(
+        ahydrate(state.get("relevant_articles") or [], runtime),
+        ahydrate(state.get("relevant_cases") or [], runtime),
+        ahydrate(state.get("historical_context") or [], runtime),
+    )
+    sections = {"articles": articles, "cases": cases, "history": history}
+    tokens_before = count_tokens("\n".join(text for texts in sections.values() for text in texts))
+    packed = pack_context(sections, CONTEXT_TOKEN_BUDGET, CONTEXT_DEDUP_THRESHOLD)
 
-    logger.debug(f"Relevant Articles: {relevant_articles}")
-    logger.debug(f"Relevant Cases: {relevant_cases}")
-    logger.debug(f"Historical Context: {historical_context}")
+    relevant_articles = "\n\n".join(packed["articles"])
+    relevant_cases = "\n".join(packed["cases"])
+    historical_context = "\n".join(packed["history"])
+    logger.info(
+        f"Context packed from {tokens_before} to "
+        f"{count_tokens(relevant_articles + relevant_cases + historical_context)} tokens "
+        f"({sum(map(len, sections.values()))} -> {sum(map(len, packed.values()))} snippets)"
+    )
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Relevant Articles: {truncate(relevant_articles)}")
+        logger.debug(f"Relevant Cases: {truncate(relevant_cases)}")
+        logger.debug(f"Historical Context: {truncate(historical_context)}")
 
     full_context = (
         f"User Query: {query}\n\n"
@@ -26,31 +71,29 @@ def synthesizer_agent(state):
         f"Historical Context:\n{historical_context}"
     )
 
-    prompt = PromptTemplate(
-        template="""You are a helpful assistant answering queries about the Constitution of India.
-        Use the provided context to formulate a comprehensive and accurate answer.
-
-        Context:
-        {context}
-
-        Question: {query}
-
-        Final Answer:""",
-        input_variables=["context", "query"]
-    )
+    # Optional async callback supplied by run_query to forward tokens as they arrive
+    on_token = ((config or {}).get("configurable") or {}).get("on_token")
 
     try:
-        chain = prompt | llm
-        final_answer = chain.invoke({"context": full_context, "query": query})
-
-        state["final_answer"] = (
-            final_answer.content if hasattr(final_answer, "content") else str(final_answer)
-        )
+        chain = _get_chain()
+        if on_token:
+            parts = []
+            async for chunk in chain.astream({"context": full_context, "query": query}):
+                token = chunk.content if hasattr(chunk, "content") else str(chunk)
+                if token:
+                    parts.append(token)
+                    await on_token(token)
+            final_answer = "".join(parts)
+        else:
+            result = await chain.ainvoke({"context": full_context, "query": query})
+            final_answer = result.content if hasattr(result, "content") else str(result)
         logger.info("Final answer generated successfully")
-        logger.debug(f"Final Answer: {state['final_answer']}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Final Answer: {truncate(final_answer)}")
     except Exception as e:
         logger.error(f"Error in synthesizer agent: {e}", exc_info=True)
-        state["final_answer"] = f"Error generating answer: {e}"
+        logger.info("Synthesizer Agent finished")
+        return {"final_answer": f"Error generating answer: {e}", "errors": [f"synthesizer: {e}"]}
 
     logger.info("Synthesizer Agent finished")
-    return state
+    return {"final_answer": final_answer}
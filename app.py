@@ -1,117 +1,41 @@
-import os
-import sys
-from config import embeddings
+import asyncio
+import threading
+from config import MAX_CONCURRENT_QUERIES, STREAM_ANSWERS
 from logger_util import setup_logger
-from utils.document_loader import load_and_split_pdfs
-from utils.routing import route_decision
-from graph_state import GraphState
-from langchain_community.vectorstores import Chroma
-from langgraph.graph import StateGraph, END
+from runtime import get_runtime
+from utils.metrics import PROMETHEUS_CONTENT_TYPE, render_prometheus
 import chainlit as cl
-
-# Agents
-from Agents.router_agent import router_agent
-from Agents.article_search_agent import article_search_agent
-from Agents.case_law_agent import case_law_agent
-from Agents.historical_context_agent import historical_context_agent
-from Agents.synthesizer_agent import synthesizer_agent
-
-# Persistent storage path for Chroma DB
-CHROMA_DIR = "./chroma_store"
+from chainlit.server import app as chainlit_app
+from fastapi import Response
 
 # Logger setup
 logger = setup_logger(__name__)
 
+# Caps in-flight graph executions so a burst of sessions cannot exhaust the
+# Groq connection pool; waiting sessions queue here without blocking the loop.
+query_semaphore = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
 
-def get_retriever(pdf_files):
-    """Load existing vectorstore if available, else create and persist."""
-    if os.path.exists(CHROMA_DIR):
-        logger.info("Loading existing Chroma DB from %s", CHROMA_DIR)
-        vectorstore = Chroma(
-            persist_directory=CHROMA_DIR,
-            embedding_function=embeddings
-        )
-    else:
-        logger.info("Creating new Chroma DB...")
-        docs = load_and_split_pdfs(pdf_files)
-        logger.info("Loaded and split %d documents", len(docs))
-
-        vectorstore = Chroma.from_documents(
-            documents=docs,
-            embedding=embeddings,
-            persist_directory=CHROMA_DIR
-        )
-        vectorstore.persist()
-        logger.info("Persisted new Chroma DB at %s", CHROMA_DIR)
-
-    return vectorstore.as_retriever()
-
-
-def build_workflow():
-    """Build and compile the LangGraph workflow."""
-    workflow = StateGraph(GraphState)
-
-    # Register nodes
-    workflow.add_node("router", router_agent)
-    workflow.add_node("article_search", article_search_agent)
-    workflow.add_node("case_law", case_law_agent)
-    workflow.add_node("historical_context", historical_context_agent)
-    workflow.add_node("synthesizer", synthesizer_agent)
-
-    # Entry point
-    workflow.set_entry_point("router")
-    workflow.add_conditional_edges("router", route_decision, {
-        "article_search": "article_search",
-        "case_law": "case_law",
-        "historical_context": "historical_context",
-        "synthesizer": "synthesizer"
-    })
+# Build and warm the shared runtime as soon as the server imports this module,
+# so the first chat session does not pay for it.
+threading.Thread(target=get_runtime, name="runtime-warmup", daemon=True).start()
 
-    # Transitions
-    workflow.add_edge("article_search", "synthesizer")
-    workflow.add_edge("case_law", "synthesizer")
-    workflow.add_edge("historical_context", "synthesizer")
-    workflow.add_edge("synthesizer", END)
 
-    return workflow.compile()
+# --- Metrics Endpoint ---
+async def metrics():
+    """Prometheus text exposition of request, stage, token and cache metrics."""
+    return Response(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 
-def run_query(app, retriever, query):
-    """Run workflow for a single query and return final answer."""
-    inputs = {"query": query, "retriever": retriever}
-    final_state = {}
-
-    for s in app.stream(inputs):
-        final_state.update(s)
-
-    if "synthesizer" in final_state:
-        return final_state["synthesizer"]["final_answer"]
-    elif "__end__" in final_state:
-        return final_state["__end__"]["final_answer"]
-    else:
-        return "No answer could be generated."
+chainlit_app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+# Chainlit serves its frontend from a catch-all route; move ours in front of it.
+chainlit_app.router.routes.insert(0, chainlit_app.router.routes.pop())
 
 
 # --- Chainlit Handlers ---
-retriever = None
-workflow_app = None
-
-
 @cl.on_chat_start
 async def start_chat():
-    global retriever, workflow_app
-
-    pdf_files = [
-        r"D:\BTP-1\pdf\20240716890312078.pdf",
-        r"D:\BTP-1\pdf\EighthSchedule_19052017.pdf",
-        r"D:\BTP-1\pdf\part3.pdf"
-    ]
-
-    logger.info("Initializing retriever...")
-    retriever = get_retriever(pdf_files)
-
-    logger.info("Compiling workflow...")
-    workflow_app = build_workflow()
+    # Returns immediately once warm-up has finished; otherwise waits for it.
+    await asyncio.to_thread(get_runtime)
 
     await cl.Message(content="Hi 👋! I’m your Indian Constitution Assistant. Ask me anything about articles, cases, or historical context.").send()
 
@@ -121,6 +45,14 @@ async def handle_message(message: cl.Message):
     query = message.content.strip()
     logger.info("Received query: %s", query)
 
-    answer = run_query(workflow_app, retriever, query)
-
-    await cl.Message(content=answer).send()
+    runtime = await asyncio.to_thread(get_runtime)
+    msg = cl.Message(content="")
+    async with query_semaphore:
+        if STREAM_ANSWERS:
+            answer = await runtime.run_query(query, on_token=msg.stream_token, session_id=cl.context.session.id)
+        else:
+            answer = await runtime.run_query(query, session_id=cl.context.session.id)
+
+    if not msg.content:
+        msg.content = answer
+    await msg.send()
@@ -0,0 +1,135 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from config import (
+    GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE, BATCH_CONCURRENCY, BATCH_MAX_RETRIES,
+)
+from logger_context import new_call_id
+from logger_util import setup_logger
+from runtime import get_runtime
+from utils.rate_limiter import RateLimiter, RateLimitCallbackHandler
+
+# Logger setup
+logger = setup_logger(__name__)
+
+
+def read_queries(path):
+    """Yield ``(id, query)`` from a JSONL file; lines without an ``id`` use their line number."""
+    with open(path, "r", encoding="utf8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield str(record.get("id", line_no)), record["query"]
+
+
+def completed_ids(path):
+    """IDs already answered without error in an existing output file, so a rerun can resume."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut off by the interruption
+            if not record.get("error"):
+                done.add(str(record["id"]))
+    return done
+
+
+async def answer_with_retries(runtime, limiter, query, max_retries):
+    """Run one query, retrying with exponential backoff while its answer is degraded or an error.
+
+    A rate-limited call fails inside its agent, so the answer is usually
+    degraded rather than an error. The run outcome is used rather than the
+    callback handler, which never fires when the query joins an identical
+    one already running. Retries bypass the answer cache and single-flight
+    so they never get an earlier or shared answer back.
+    """
+    for attempt in range(1, max_retries + 2):
+        handler = RateLimitCallbackHandler(limiter)
+        answer, outcome = await runtime.run_query_with_outcome(query, callbacks=[handler], use_cache=attempt == 1)
+        if outcome not in ("degraded", "error"):
+            return answer, False, attempt
+        if attempt > max_retries:
+            return answer, True, attempt
+        delay = max(handler.retry_after, 2 ** attempt) + random.uniform(0, 1)
+        logger.warning(
+            "Query %s%s (attempt %d); retrying in %.1fs",
+            outcome, " by rate limits" if handler.rate_limited else "", attempt, delay,
+        )
+        await asyncio.sleep(delay)
+
+
+async def run_batch(input_path, output_path, concurrency, rpm, tpm, max_retries):
+    # Batch-level logs share one call ID; each query then gets its own
+    new_call_id()
+    runtime = get_runtime()
+    limiter = RateLimiter(rpm, tpm)
+    done = completed_ids(output_path)
+    pending = [(qid, query) for qid, query in read_queries(input_path) if qid not in done]
+    logger.info("Batch: %d queries pending, %d already completed", len(pending), len(done))
+
+    queue = asyncio.Queue()
+    for item in pending:
+        queue.put_nowait(item)
+
+    start = time.perf_counter()
+    finished = 0
+
+    with open(output_path, "a", encoding="utf8") as out:
+        async def worker():
+            nonlocal finished
+            while True:
+                try:
+                    qid, query = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                query_start = time.perf_counter()
+                try:
+                    answer, failed, attempts = await answer_with_retries(runtime, limiter, query, max_retries)
+                except Exception as e:
+                    logger.error("Batch query %s failed: %s", qid, str(e), exc_info=True)
+                    answer, failed, attempts = f"Error: {e}", True, 1
+                record = {
+                    "id": qid,
+                    "query": query,
+                    "answer": answer,
+                    "error": failed,
+                    "attempts": attempts,
+                    "latency_s": round(time.perf_counter() - query_start, 3),
+                }
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                finished += 1
+                if finished % 10 == 0 or finished == len(pending):
+                    elapsed = time.perf_counter() - start
+                    logger.info(
+                        "Batch progress: %d/%d (%.2f queries/min)", finished, len(pending), finished / elapsed * 60
+                    )
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+
+    logger.info("Batch finished: %d queries in %.1fs", finished, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of queries through the agent graph.")
+    parser.add_argument("input", help="JSONL file with one {\"id\": ..., \"query\": ...} object per line")
+    parser.add_argument("output", help="JSONL file results are appended to; rerun with the same file to resume")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--rpm", type=float, default=GROQ_REQUESTS_PER_MINUTE, help="LLM requests per minute")
+    parser.add_argument("--tpm", type=float, default=GROQ_TOKENS_PER_MINUTE, help="LLM tokens per minute")
+    parser.add_argument("--max-retries", type=int, default=BATCH_MAX_RETRIES)
+    args = parser.parse_args()
+
+    asyncio.run(run_batch(args.input, args.output, args.concurrency, args.rpm, args.tpm, args.max_retries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+DEFAULT_WORK_DIR = os.path.join(BENCH_DIR, ".work")
+DEFAULT_QUERIES = os.path.join(BENCH_DIR, "queries.jsonl")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, retrieval and graph latency.")
+    parser.add_argument("--llm", choices=["fake", "groq"], default="fake", help="LLM backend (default: fake)")
+    parser.add_argument("--embeddings", choices=["hash", "huggingface", "onnx"], default="hash",
+                        help="embeddings backend (default: hash)")
+    parser.add_argument("--vector-backend", choices=["chroma", "flat", "flat-int8"], default="chroma",
+                        help="vector store queried by the retriever (default: chroma)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="stand-in LLM latency in seconds")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="JSONL file of {\"query\": ...} objects")
+    parser.add_argument("--retrieval-rounds", type=int, default=5, help="passes over the queries for retrieval timing")
+    parser.add_argument("--agreement-k", default="4,20", help="comma-separated k for the vector backend comparison")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated end-to-end concurrency levels")
+    parser.add_argument("--requests-per-level", type=int, default=40)
+    parser.add_argument("--skip-ingestion", action="store_true", help="reuse the existing benchmark vector store")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="where benchmark stores and caches are kept")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="print latency changes against an earlier result file")
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    """Point config/runtime at the chosen backends and an isolated work directory.
+
+    Must run before ``config`` is imported; run from the repository root so
+    the relative ``pdf/`` and ``data/`` paths resolve. Answer and embedding
+    caches and single-flight coalescing are disabled so repeated queries and
+    re-ingestion measure real work.
+    """
+    work = os.path.abspath(args.work_dir)
+    os.environ.update({
+        "LLM_BACKEND": args.llm,
+        "EMBEDDINGS_BACKEND": args.embeddings,
+        "VECTOR_BACKEND": args.vector_backend,
+        "FAKE_LLM_LATENCY_SECONDS": str(args.llm_latency),
+        "ANSWER_CACHE": "false",
+        "SINGLE_FLIGHT": "false",
+        "EMBEDDING_CACHE": "false",
+        "CHROMA_DIR": os.path.join(work, f"chroma_store-{args.embeddings}"),
+        "CASE_LAW_STORE_DIR": os.path.join(work, f"case_law_store-{args.embeddings}"),
+        "AMENDMENT_TIMELINE_PATH": os.path.join(work, "amendment_store", "timeline.pkl"),
+    })
+    if not args.skip_ingestion:
+        shutil.rmtree(os.environ["CHROMA_DIR"], ignore_errors=True)
+        shutil.rmtree(os.environ["CASE_LAW_STORE_DIR"], ignore_errors=True)
+    sys.path.insert(0, REPO_DIR)
+
+
+def summarize(seconds):
+    """Latency summary in milliseconds."""
+    if not seconds:
+        return {"count": 0}
+    ms = np.asarray(seconds) * 1000.0
+    return {
+        "count": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def load_queries(path):
+    with open(path, "r", encoding="utf8") as f:
+        return [json.loads(line)["query"] for line in f if line.strip()]
+
+
+def make_node_timer(node_names):
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class NodeTimer(BaseCallbackHandler):
+        """Collects wall time of each LangGraph node run."""
+
+        run_inline = True
+
+        def __init__(self):
+            self.timings = {name: [] for name in node_names}
+            self._starts = {}
+
+        def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+            name = kwargs.get("name")
+            if name in self.timings and (metadata or {}).get("langgraph_node") == name:
+                self._starts[run_id] = (name, time.perf_counter())
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            if run_id in self._starts:
+                name, start = self._starts.pop(run_id)
+                self.timings[name].append(time.perf_counter() - start)
+
+        def on_chain_error(self, error, *, run_id, **kwargs):
+            self._starts.pop(run_id, None)
+
+    return NodeTimer()
+
+
+def bench_ingestion(skip):
+    """Time ``sync_corpus`` alone, then build the runtime on the synced store.
+
+    The embedding model is loaded and warmed before the clock starts, and
+    runtime construction (case store, timeline, graph compilation) is
+    reported separately as ``startup_s``, so the rates measure ingestion only.
+    """
+    from langchain_community.vectorstores import Chroma
+    from config import get_embeddings
+    from runtime import Runtime, ARTICLE_INDEX_PATH, CHROMA_DIR, MANIFEST_PATH, list_pdf_files
+    from utils.article_index import ArticleIndex
+    from utils.document_loader import _page_count
+    from utils.ingestion import sync_corpus
+
+    results = {"skipped": True}
+    if not skip:
+        files = list_pdf_files()
+        embeddings = get_embeddings()
+        embeddings.embed_query("warm-up")
+        os.makedirs(CHROMA_DIR, exist_ok=True)
+        vectorstore = Chroma(persist_directory=CHROMA_DIR, embedding_function=embeddings)
+        article_index = ArticleIndex(ARTICLE_INDEX_PATH)
+        start = time.perf_counter()
+        manifest = sync_corpus(vectorstore, files, MANIFEST_PATH, article_index=article_index)
+        elapsed = time.perf_counter() - start
+
+        chunks = sum(len(entry["chunks"]) for entry in manifest["files"].values())
+        pages = sum(_page_count(path) for path in files)
+        results = {
+            "files": len(files),
+            "pages": pages,
+            "chunks": chunks,
+            "seconds": round(elapsed, 3),
+            "pages_per_s": round(pages / elapsed, 2),
+            "chunks_per_s": round(chunks / elapsed, 2),
+        }
+
+    start = time.perf_counter()
+    runtime = Runtime()
+    results["startup_s"] = round(time.perf_counter() - start, 3)
+    return runtime, results
+
+
+async def bench_retrieval(runtime, queries, rounds):
+    await runtime.retriever.ainvoke(queries[0])
+    latencies = []
+    for _ in range(rounds):
+        for query in queries:
+            start = time.perf_counter()
+            await runtime.retriever.ainvoke(query)
+            latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def bench_vector_backends(queries, ks, rounds):
+    """Search latency and top-k agreement of Chroma and the flat float32/int8 stores on the same query vectors.
+
+    Queries are embedded once up front so only the search itself is timed.
+    ``agreement@k`` is the overlap with the exact cosine top-k of the flat
+    float32 store over the vectors stored in Chroma. It measures how closely a
+    backend reproduces exact search, not whether the chunks are relevant, so
+    the flat store scores 1.0 by construction.
+    """
+    from langchain_community.vectorstores import Chroma
+    from config import get_embeddings
+    from runtime import CHROMA_DIR, MANIFEST_PATH
+    from utils.ingestion import load_manifest
+    from utils.vector_snapshot import VectorSnapshot
+
+    embeddings = get_embeddings()
+    chroma = Chroma(persist_directory=CHROMA_DIR, embedding_function=embeddings)
+    version = load_manifest(MANIFEST_PATH)["corpus_version"]
+    work = os.path.join(os.path.dirname(CHROMA_DIR), "vector_backends")
+    flat = VectorSnapshot.build(chroma, os.path.join(work, "flat"), version, embeddings)
+    flat_int8 = VectorSnapshot.build(chroma, os.path.join(work, "flat-int8"), version, embeddings, "int8")
+    vectors = embeddings.embed_documents(queries)
+    top_k = max(ks)
+    exact = [[flat.chunk_ids[row] for row, _ in hits] for hits in flat.top_rows(vectors, top_k)]
+
+    def chroma_search(vector):
+        return [doc.metadata.get("chunk_id", doc.id) for doc in chroma.similarity_search_by_vector(vector, k=top_k)]
+
+    def flat_search(store):
+        return lambda vector: [store.chunk_ids[row] for row, _ in store.top_rows(vector, top_k)[0]]
+
+    results = {}
+    for name, search in (("chroma", chroma_search), ("flat", flat_search(flat)), ("flat-int8", flat_search(flat_int8))):
+        search(vectors[0])
+        latencies, found = [], []
+        for _ in range(rounds):
+            found = []
+            for vector in vectors:
+                start = time.perf_counter()
+                found.append(search(vector))
+                latencies.append(time.perf_counter() - start)
+        results[name] = dict(summarize(latencies), **{
+            f"agreement@{k}": round(float(np.mean([len(set(f[:k]) & set(e[:k])) / k for f, e in zip(found, exact)])), 4)
+            for k in ks
+        })
+
+    for name, store in (("flat", flat), ("flat-int8", flat_int8)):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            store.top_rows(vectors, top_k)
+        results[name]["batched_per_query_ms"] = round((time.perf_counter() - start) / (rounds * len(vectors)) * 1000, 4)
+        results[name]["matrix_bytes"] = int(store.vectors.nbytes + (store.scales.nbytes if store.scales is not None else 0))
+    return results
+
+
+async def bench_nodes(runtime, queries):
+    """Run each query once, sequentially, recording per-node and end-to-end latency."""
+    timer = make_node_timer(["router", "article_search", "case_law", "historical_context", "synthesizer"])
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        await runtime.run_query(query, callbacks=[timer])
+        latencies.append(time.perf_counter() - start)
+    return {name: summarize(values) for name, values in timer.timings.items()}, summarize(latencies)
+
+
+async def bench_concurrency(runtime, queries, level, total):
+    semaphore = asyncio.Semaphore(level)
+    latencies = []
+
+    async def one(query):
+        async with semaphore:
+            start = time.perf_counter()
+            await runtime.run_query(query)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(queries[i % len(queries)]) for i in range(total)))
+    wall = time.perf_counter() - start
+    return dict(summarize(latencies), wall_s=round(wall, 3), throughput_qps=round(total / wall, 3))
+
+
+def flatten(results, prefix=""):
+    metrics = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and (key.endswith("_ms") or key.endswith("_per_s") or key.endswith("_qps")):
+            metrics[path] = value
+    return metrics
+
+
+def compare(baseline_path, results):
+    with open(baseline_path, "r", encoding="utf8") as f:
+        baseline = json.load(f)
+    old, new = flatten(baseline), flatten(results)
+    print(f"\nComparison against {baseline.get('commit')} ({baseline_path}):")
+    for path in sorted(old.keys() & new.keys()):
+        if old[path]:
+            change = (new[path] - old[path]) / old[path] * 100
+            print(f"  {path:<55} {old[path]:>12.3f} -> {new[path]:>12.3f}  ({change:+.1f}%)")
+
+
+async def run(args):
+    from logger_util import setup_logger
+    logger = setup_logger("benchmarks")
+
+    queries = load_queries(args.queries)
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    commit, dirty = git_commit()
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {
+            "llm": args.llm,
+            "embeddings": args.embeddings,
+            "vector_backend": args.vector_backend,
+            "llm_latency_s": args.llm_latency if args.llm == "fake" else None,
+            "queries": len(queries),
+            "retrieval_rounds": args.retrieval_rounds,
+            "requests_per_level": args.requests_per_level,
+        },
+    }
+
+    logger.info("Benchmark: ingestion")
+    runtime, results["ingestion"] = bench_ingestion(args.skip_ingestion)
+    logger.info("Benchmark: retrieval")
+    results["retrieval"] = await bench_retrieval(runtime, queries, args.retrieval_rounds)
+    logger.info("Benchmark: vector backends")
+    ks = [int(k) for k in args.agreement_k.split(",") if k.strip()]
+    results["vector_backends"] = bench_vector_backends(queries, ks, args.retrieval_rounds)
+    logger.info("Benchmark: per-node latency")
+    results["nodes"], sequential = await bench_nodes(runtime, queries)
+    results["end_to_end"] = {"sequential": sequential, "concurrency": {}}
+    for level in levels:
+        logger.info("Benchmark: end-to-end at concurrency %d", level)
+        results["end_to_end"]["concurrency"][str(level)] = await bench_concurrency(
+            runtime, queries, level, args.requests_per_level
+        )
+    return results
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    results = asyncio.run(run(args))
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
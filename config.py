@@ -1,14 +1,11 @@
 import os
-import uuid
+import threading
 from dotenv import load_dotenv
 from logger_util import setup_logger
-from logger_context import call_id_var
-from langchain_groq import ChatGroq
-from langchain_huggingface import HuggingFaceEmbeddings
+from utils.startup import startup_phase
 
 # Setup logger
 logger = setup_logger(__name__)
-call_id_var.set(str(uuid.uuid4()))
 
 # --- Load environment variables ---
 logger.info("Loading environment variables from .env file...")
@@ -21,24 +18,206 @@ if not GROQ_API_KEY:
 else:
     logger.info("Successfully loaded GROQ_API_KEY.")
 
+# --- Workflow Setup ---
+# "fanout" runs every agent the router selects in parallel; "single" keeps the
+# original behaviour of following only the first selected branch.
+ROUTING_MODE = os.getenv("ROUTING_MODE", "fanout").lower()
+AGENT_TIMEOUT_SECONDS = float(os.getenv("AGENT_TIMEOUT_SECONDS", "20"))
+# Upper bound on queries executing concurrently in one process.
+MAX_CONCURRENT_QUERIES = int(os.getenv("MAX_CONCURRENT_QUERIES", "8"))
+# Forward synthesizer tokens to the UI/CLI as they are generated.
+STREAM_ANSWERS = os.getenv("STREAM_ANSWERS", "true").lower() == "true"
+# The LLM router is only called when the local router is less confident than this.
+ROUTER_LOCAL_CONFIDENCE = float(os.getenv("ROUTER_LOCAL_CONFIDENCE", "0.6"))
+# SQLite file for per-session LangGraph checkpoints (needs langgraph-checkpoint-sqlite); empty disables them.
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "")
+# How long a checkpoint write waits for another process's lock (SQLite busy timeout).
+CHECKPOINT_BUSY_TIMEOUT_SECONDS = float(os.getenv("CHECKPOINT_BUSY_TIMEOUT_SECONDS", "30"))
+
+# --- Server Setup ---
+# HTTP query API (server.py); each worker process serves from the shared memory-mapped indexes.
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "0")) or os.cpu_count() or 1
+
+# --- Batch Setup ---
+# Groq account limits the batch runner schedules against.
+GROQ_REQUESTS_PER_MINUTE = float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = float(os.getenv("GROQ_TOKENS_PER_MINUTE", "12000"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "5"))
+
+# --- Ingestion Setup ---
+# Processes used to extract PDF pages (defaults to one per CPU core).
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+# Chunks embedded and written to the vector store per batch.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# --- Vector Store Setup ---
+# "chroma" queries Chroma directly; "flat" and "flat-int8" query a memory-mapped
+# float32 or int8-quantised matrix exported from it (Chroma stays the ingestion store).
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+
+# --- Retrieval Setup ---
+# "hybrid" fuses BM25 and dense results; "dense" uses the vector store alone.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+# Chunks returned per retrieval, and candidates fetched per method before fusion.
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+
+# --- Case Law Setup ---
+# JSONL/Parquet judgment records, compiled into a memory-mapped store on startup.
+CASE_LAW_DATA_DIR = os.getenv("CASE_LAW_DATA_DIR", "./data/case_law")
+CASE_LAW_STORE_DIR = os.getenv("CASE_LAW_STORE_DIR", "./case_law_store")
+CASE_LAW_TOP_K = int(os.getenv("CASE_LAW_TOP_K", "5"))
+# Minimum headnote similarity for a case the query does not name.
+CASE_LAW_MIN_SIMILARITY = float(os.getenv("CASE_LAW_MIN_SIMILARITY", "0.5"))
+
+# --- Amendment Timeline Setup ---
+# JSONL amendment/event records, compiled into a pickled timeline on startup.
+AMENDMENTS_DATA_DIR = os.getenv("AMENDMENTS_DATA_DIR", "./data/amendments")
+AMENDMENT_TIMELINE_PATH = os.getenv("AMENDMENT_TIMELINE_PATH", "./amendment_store/timeline.pkl")
+HISTORY_MAX_EVENTS = int(os.getenv("HISTORY_MAX_EVENTS", "10"))
+
+# --- Context Packing Setup ---
+# Token budget for retrieved context passed to the synthesizer (excluding the prompt template).
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# Estimated Jaccard similarity at which a snippet counts as a near-duplicate.
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+
+# --- Answer Cache Setup ---
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "true").lower() == "true"
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+# Minimum cosine similarity for a new query to reuse a cached answer.
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# Concurrent identical (normalised) queries share one graph execution.
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "true").lower() == "true"
+
+# --- Conversation Cache Setup ---
+# Last retrieved chunk set per session, reused or extended by follow-up queries.
+CONVERSATION_CACHE = os.getenv("CONVERSATION_CACHE", "true").lower() == "true"
+CONVERSATION_CACHE_SESSIONS = int(os.getenv("CONVERSATION_CACHE_SESSIONS", "1024"))
+CONVERSATION_CACHE_TTL_SECONDS = float(os.getenv("CONVERSATION_CACHE_TTL_SECONDS", "1800"))
+# Upper bound on a session's chunk set as follow-ups extend it.
+CONVERSATION_MAX_CHUNKS = int(os.getenv("CONVERSATION_MAX_CHUNKS", "8"))
+
 # --- LLM Setup ---
-try:
+# "groq" calls the Groq API; "fake" is a local stand-in with fixed latency for benchmarks.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq").lower()
+FAKE_LLM_LATENCY_SECONDS = float(os.getenv("FAKE_LLM_LATENCY_SECONDS", "0.5"))
+
+_llm = None
+_llm_lock = threading.Lock()
+
+
+def _build_llm():
+    if LLM_BACKEND == "fake":
+        from utils.stand_ins import FakeChatModel
+        logger.info(f"Using stand-in LLM with {FAKE_LLM_LATENCY_SECONDS}s latency")
+        return FakeChatModel(latency_seconds=FAKE_LLM_LATENCY_SECONDS)
+    from langchain_groq import ChatGroq
     logger.info("Initializing ChatGroq LLM (llama-3.3-70b-versatile)...")
     llm = ChatGroq(model="llama-3.3-70b-versatile", temperature=0, api_key=GROQ_API_KEY)
     logger.info("ChatGroq LLM initialized successfully.")
-except Exception as e:
-    logger.exception(f"Failed to initialize ChatGroq LLM: {e}")
-    raise
+    return llm
+
+
+def get_llm():
+    """The shared chat model, constructed (and its client library imported) on first use."""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                try:
+                    with startup_phase("llm"):
+                        _llm = _build_llm()
+                except Exception as e:
+                    logger.exception(f"Failed to initialize LLM: {e}")
+                    raise
+    return _llm
+
 
 # --- Embeddings Setup ---
-try:
-    logger.info("Loading HuggingFace sentence-transformers/all-MiniLM-L6-v2 embeddings...")
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={'device': 'cpu'},
-        encode_kwargs={'normalize_embeddings': False}
-    )
-    logger.info("HuggingFace embeddings initialized successfully.")
-except Exception as e:
-    logger.exception(f"Failed to initialize HuggingFace embeddings: {e}")
-    raise
+# "huggingface" runs all-MiniLM-L6-v2 locally through PyTorch; "onnx" runs an exported copy
+# with onnxruntime; "hash" is a deterministic model-free stand-in.
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "huggingface").lower()
+HF_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Texts per model call, for both the PyTorch and ONNX backends.
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+# ONNX backend: directory written by `python -m utils.onnx_embeddings export`, int8 model
+# selection, intra-op threads (0 = onnxruntime default) and token truncation length.
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./onnx_model")
+ONNX_INT8 = os.getenv("ONNX_INT8", "false").lower() == "true"
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+ONNX_MAX_SEQ_LENGTH = int(os.getenv("ONNX_MAX_SEQ_LENGTH", "256"))
+# Identifies the vectors in the embedding cache; int8 vectors must not mix with float ones.
+EMBEDDING_MODEL = {
+    "hash": "hashing-384",
+    "onnx": f"{HF_EMBEDDING_MODEL}-onnx" + ("-int8" if ONNX_INT8 else ""),
+}.get(EMBEDDINGS_BACKEND, HF_EMBEDDING_MODEL)
+NORMALIZE_EMBEDDINGS = False
+# On-disk cache of computed document embeddings; set EMBEDDING_CACHE=false to disable.
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "true").lower() == "true"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./embedding_cache")
+# Query embeddings are kept in a per-process LRU of this many entries instead of on disk.
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+
+def _build_embeddings():
+    if EMBEDDINGS_BACKEND == "hash":
+        from utils.stand_ins import HashingEmbeddings
+        logger.info("Using stand-in hashing embeddings")
+        embeddings = HashingEmbeddings()
+    elif EMBEDDINGS_BACKEND == "onnx":
+        from utils.onnx_embeddings import OnnxEmbeddings
+        embeddings = OnnxEmbeddings(
+            ONNX_MODEL_DIR, quantized=ONNX_INT8, batch_size=EMBEDDING_BATCH_SIZE,
+            threads=ONNX_THREADS, max_seq_length=ONNX_MAX_SEQ_LENGTH,
+        )
+    else:
+        # Imports torch and sentence-transformers; kept out of module import
+        from langchain_huggingface import HuggingFaceEmbeddings
+        logger.info(f"Loading HuggingFace {HF_EMBEDDING_MODEL} embeddings...")
+        embeddings = HuggingFaceEmbeddings(
+            model_name=HF_EMBEDDING_MODEL,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'normalize_embeddings': NORMALIZE_EMBEDDINGS, 'batch_size': EMBEDDING_BATCH_SIZE}
+        )
+    if EMBEDDING_CACHE:
+        from utils.embedding_cache import CachedEmbeddings
+        embeddings = CachedEmbeddings(
+            embeddings, EMBEDDING_MODEL, NORMALIZE_EMBEDDINGS, EMBEDDING_CACHE_DIR, QUERY_EMBEDDING_CACHE_SIZE
+        )
+        logger.info(f"Embedding cache enabled at {EMBEDDING_CACHE_DIR}")
+    logger.info("Embeddings initialized successfully.")
+    return embeddings
+
+
+def get_embeddings():
+    """The shared embedder, constructed (and its model loaded) on first use."""
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                try:
+                    with startup_phase("embeddings"):
+                        _embeddings = _build_embeddings()
+                except Exception as e:
+                    logger.exception(f"Failed to initialize embeddings: {e}")
+                    raise
+    return _embeddings
+
+
+def warmup():
+    """Construct the LLM and embedder now rather than on the first query.
+
+    Runs one embedding so model weights are loaded and paged in; processes
+    that serve traffic call this before accepting requests.
+    """
+    get_llm()
+    with startup_phase("embedder warm-up"):
+        get_embeddings().embed_query("warm-up")
@@ -1,4 +1,4 @@
-from typing import TypedDict, List, Any
+from typing import Annotated, TypedDict, List, Optional
 from logger_util import setup_logger
 from pydantic import BaseModel, Field
 from langchain.output_parsers import PydanticOutputParser
@@ -6,15 +6,29 @@ from langchain.output_parsers import PydanticOutputParser
 # Setup logger
 logger = setup_logger(__name__)
 
+def merge_errors(current: Optional[List[str]], new: Optional[List[str]]) -> List[str]:
+    """Reducer for ``errors``: parallel branches append, and ``None`` (every turn's input) clears them."""
+    if new is None:
+        return []
+    return (current or []) + new
+
+
 class GraphState(TypedDict):
-    """Represents the state shared across agents in the LangGraph workflow."""
+    """Represents the state shared across agents in the LangGraph workflow.
+
+    Only plain, checkpointable data lives here. Retrieved context is kept as
+    compact references (``utils.chunk_refs.make_ref``) and hydrated to text
+    by the synthesizer; the retriever and indexes are reached through the
+    ``Runtime`` in ``config["configurable"]["runtime"]``. ``errors`` collects
+    the failures agents recovered from, so a degraded answer is not cached.
+    """
     query: str
-    relevant_articles: List[str]
-    relevant_cases: List[str]
-    historical_context: List[str]
+    relevant_articles: List[dict]
+    relevant_cases: List[dict]
+    historical_context: List[dict]
     final_answer: str
     routing_decision: dict
-    retriever: Any
+    errors: Annotated[List[str], merge_errors]
 
 
 class RouterOutput(BaseModel):
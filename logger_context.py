@@ -1,4 +1,12 @@
 # --- logger_context.py ---
+import uuid
 from contextvars import ContextVar
 
-call_id_var: ContextVar[str] = ContextVar("call_id", default="N/A")
\ No newline at end of file
+call_id_var: ContextVar[str] = ContextVar("call_id", default="N/A")
+
+
+def new_call_id() -> str:
+    """Give the current task (and tasks it spawns) a fresh call ID for log correlation."""
+    call_id = uuid.uuid4().hex[:12]
+    call_id_var.set(call_id)
+    return call_id
@@ -1,21 +1,85 @@
 # --- logger_util.py ---
+import atexit
 import logging
 import logging.config
+import logging.handlers
+import os
+import queue
+import threading
 import yaml
 from pathlib import Path
 from logger_context import call_id_var
 
+# Longest payload (article text, context, answer) written by truncate(); 0 logs payloads in full
+LOG_MAX_PAYLOAD_CHARS = int(os.getenv("LOG_MAX_PAYLOAD_CHARS", "500"))
+
+_configured = False
+_configure_lock = threading.Lock()
+_listeners = []
+
 
 class ContextFilter(logging.Filter):
     def filter(self, record):
-        record.call_id = call_id_var.get()
+        # Keep the call ID stamped in the request's context when the record
+        # is handled again on the queue listener thread
+        if not hasattr(record, "call_id"):
+            record.call_id = call_id_var.get()
         return True
 
 
-def setup_logger(module_name: str, config_path: str = "logging_config.yaml") -> logging.Logger:
+def truncate(payload, limit: int = None) -> str:
+    """Shorten a large log payload to ``LOG_MAX_PAYLOAD_CHARS``, noting how much was dropped."""
+    text = str(payload)
+    limit = LOG_MAX_PAYLOAD_CHARS if limit is None else limit
+    if limit <= 0 or len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+def _stop_listeners():
+    for listener in _listeners:
+        listener.stop()
+    _listeners.clear()
+
+
+def _move_handlers_to_queue():
+    """Replace every configured handler with a ``QueueHandler`` whose ``QueueListener`` owns the real ones.
+
+    Loggers sharing the same handler list share one queue and listener
+    thread, so console and file writes leave the request path. Filters run
+    on the caller's side, where the call ID context is still set.
+    """
+    loggers = [logging.getLogger()] + [
+        logger for logger in logging.Logger.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger) and logger.handlers
+    ]
+    queue_handlers = {}
+    for logger in loggers:
+        handlers = tuple(h for h in logger.handlers if not isinstance(h, logging.handlers.QueueHandler))
+        if not handlers:
+            continue
+        queue_handler = queue_handlers.get(handlers)
+        if queue_handler is None:
+            log_queue = queue.SimpleQueue()
+            queue_handler = logging.handlers.QueueHandler(log_queue)
+            for handler in handlers:
+                for log_filter in handler.filters:
+                    if log_filter not in queue_handler.filters:
+                        queue_handler.addFilter(log_filter)
+            listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+            listener.start()
+            _listeners.append(listener)
+            queue_handlers[handlers] = queue_handler
+        for handler in handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handler)
+    atexit.register(_stop_listeners)
+
+
+def _configure(config_path: str):
     # Ensure logs directory exists
     Path("logs").mkdir(exist_ok=True)
-    
+
     # Load logging configuration from YAML
     try:
         with open(config_path, 'r') as f:
@@ -44,4 +108,20 @@ def setup_logger(module_name: str, config_path: str = "logging_config.yaml") ->
         for handler in logging.getLogger().handlers:
             handler.addFilter(ContextFilter())
 
-    return logging.getLogger(module_name)
\ No newline at end of file
+    # Optional override of the root level, e.g. LOG_LEVEL=DEBUG for payload logs
+    if os.getenv("LOG_LEVEL"):
+        logging.getLogger().setLevel(os.getenv("LOG_LEVEL").upper())
+
+    _move_handlers_to_queue()
+
+
+def setup_logger(module_name: str, config_path: str = "logging_config.yaml") -> logging.Logger:
+    # Configure logging once per process; later calls only look up the logger
+    global _configured
+    if not _configured:
+        with _configure_lock:
+            if not _configured:
+                _configure(config_path)
+                _configured = True
+
+    return logging.getLogger(module_name)
@@ -1,126 +1,29 @@
-import os
-import sys
+import asyncio
 import uuid
-from config import embeddings
+from config import STREAM_ANSWERS
+from logger_context import new_call_id
 from logger_util import setup_logger
-from utils.document_loader import load_and_split_pdfs
-from utils.routing import route_decision
-from graph_state import GraphState
-from langchain_community.vectorstores import Chroma
-from langgraph.graph import StateGraph, END
-
-# Agents
-from Agents.router_agent import router_agent
-from Agents.article_search_agent import article_search_agent
-from Agents.case_law_agent import case_law_agent
-from Agents.historical_context_agent import historical_context_agent
-from Agents.synthesizer_agent import synthesizer_agent
-
-# Persistent storage path for Chroma DB
-CHROMA_DIR = "./chroma_store"
+from utils.startup import startup_phase
 
 # Logger setup
 logger = setup_logger(__name__)
 
 
-def get_retriever(pdf_files):
-    try:
-        if os.path.exists(CHROMA_DIR):
-            logger.info("Loading existing Chroma DB from %s", CHROMA_DIR)
-            vectorstore = Chroma(
-                persist_directory=CHROMA_DIR,
-                embedding_function=embeddings
-            )
-        else:
-            logger.info("Creating new Chroma DB...")
-            docs = load_and_split_pdfs(pdf_files)
-            logger.info("Loaded and split %d documents", len(docs))
-
-            vectorstore = Chroma.from_documents(
-                documents=docs,
-                embedding=embeddings,
-                persist_directory=CHROMA_DIR
-            )
-            vectorstore.persist()
-            logger.info("Persisted new Chroma DB at %s", CHROMA_DIR)
-
-        logger.info("Retriever initialized successfully")
-        return vectorstore.as_retriever()
-
-    except Exception as e:
-        logger.error("Failed to initialize retriever: %s", str(e), exc_info=True)
-        raise
-
-
-def build_workflow():
-    try:
-        logger.info("Building the LangGraph...")
-        workflow = StateGraph(GraphState)
-
-        # Register nodes
-        workflow.add_node("router", router_agent)
-        workflow.add_node("article_search", article_search_agent)
-        workflow.add_node("case_law", case_law_agent)
-        workflow.add_node("historical_context", historical_context_agent)
-        workflow.add_node("synthesizer", synthesizer_agent)
-
-        # Define entry & routing
-        workflow.set_entry_point("router")
-        workflow.add_conditional_edges("router", route_decision, {
-            "article_search": "article_search",
-            "case_law": "case_law",
-            "historical_context": "historical_context",
-            "synthesizer": "synthesizer"
-        })
-
-        # Define transitions
-        workflow.add_edge("article_search", "synthesizer")
-        workflow.add_edge("case_law", "synthesizer")
-        workflow.add_edge("historical_context", "synthesizer")
-        workflow.add_edge("synthesizer", END)
-
-        app = workflow.compile()
-        logger.info("Graph compiled successfully.")
-        return app
-    except Exception as e:
-        logger.error("Error building graph: %s", str(e), exc_info=True)
-        sys.exit(1)
-
-
-def run_query(app, retriever, query):
-    logger.info("Running workflow with query: %s", query)
-    inputs = {"query": query, "retriever": retriever}
-    final_state = {}
-
-    try:
-        for s in app.stream(inputs):
-            logger.debug("Current State Keys: %s", list(s.keys()))
-            final_state.update(s)
-
-        if "synthesizer" in final_state:
-            return final_state["synthesizer"]["final_answer"]
-        elif "__end__" in final_state:
-            return final_state["__end__"]["final_answer"]
-        else:
-            logger.warning("No final answer produced. Keys: %s", final_state.keys())
-            return "No answer could be generated."
-    except Exception as e:
-        logger.error("Error during workflow execution: %s", str(e), exc_info=True)
-        return f"Error: {e}"
-
-
-def main():
-    pdf_files = [
-        r"D:\BTP-1\pdf\20240716890312078.pdf",
-        r"D:\BTP-1\pdf\EighthSchedule_19052017.pdf",
-        r"D:\BTP-1\pdf\part3.pdf"
-    ]
+def load_runtime():
+    # Start-up logs share one call ID; each query then gets its own
+    new_call_id()
+    # Imports the graph, agents and vector store libraries as well as building them
+    with startup_phase("import runtime"):
+        from runtime import get_runtime
+    return get_runtime()
 
-    logger.info("Initializing retriever...")
-    retriever = get_retriever(pdf_files)
 
-    logger.info("Compiling workflow...")
-    app = build_workflow()
+async def main():
+    # Build the runtime in the background so the prompt appears immediately;
+    # the first query waits for it if it is not ready yet.
+    runtime_future = asyncio.get_running_loop().run_in_executor(None, load_runtime)
+    # Checkpoint thread for this REPL session when CHECKPOINT_DB is set
+    session_id = uuid.uuid4().hex
 
     # --- Interactive loop ---
     logger.info("Entering interactive query mode. Type 'q' or 'quit' to exit.")
@@ -134,10 +37,28 @@ def main():
             if not query:
                 continue
 
-            answer = run_query(app, retriever, query)
-            print("\n--- Final Answer ---\n")
-            print(answer)
-            print("\n--------------------\n")
+            runtime = await runtime_future
+
+            if STREAM_ANSWERS:
+                streamed = False
+
+                async def print_token(token):
+                    nonlocal streamed
+                    if not streamed:
+                        print("\n--- Final Answer ---\n")
+                        streamed = True
+                    print(token, end="", flush=True)
+
+                answer = await runtime.run_query(query, on_token=print_token, session_id=session_id)
+                if not streamed:
+                    print("\n--- Final Answer ---\n")
+                    print(answer, end="")
+                print("\n\n--------------------\n")
+            else:
+                answer = await runtime.run_query(query, session_id=session_id)
+                print("\n--- Final Answer ---\n")
+                print(answer)
+                print("\n--------------------\n")
 
         except KeyboardInterrupt:
             logger.info("Keyboard interrupt received. Exiting.")
@@ -147,4 +68,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
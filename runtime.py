@@ -0,0 +1,497 @@
+import asyncio
+import glob
+import os
+import threading
+import time
+from config import (
+    get_embeddings, get_llm, warmup as warmup_providers, CHECKPOINT_DB, CHECKPOINT_BUSY_TIMEOUT_SECONDS, EMBEDDING_MODEL,
+    VECTOR_BACKEND, RETRIEVAL_MODE, RETRIEVAL_K, RETRIEVAL_FETCH_K, CASE_LAW_DATA_DIR, CASE_LAW_STORE_DIR,
+    AMENDMENTS_DATA_DIR, AMENDMENT_TIMELINE_PATH,
+    ANSWER_CACHE, ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL_SECONDS, SEMANTIC_CACHE_THRESHOLD, SINGLE_FLIGHT,
+    CONVERSATION_CACHE, CONVERSATION_CACHE_SESSIONS, CONVERSATION_CACHE_TTL_SECONDS, CONVERSATION_MAX_CHUNKS,
+)
+from logger_util import setup_logger
+from logger_context import new_call_id
+from utils.ingestion import load_manifest, sync_corpus
+from utils.answer_cache import AnswerCache, normalize_query, query_references
+from utils.conversation_cache import ConversationCache
+from utils.single_flight import SingleFlight
+from utils.article_index import ArticleIndex
+from utils.case_law_store import ensure_case_store, load_case_store
+from utils.amendment_timeline import ensure_timeline, load_timeline
+from utils.hybrid_retriever import HybridRetriever
+from utils.lexical_index import LexicalIndex, ensure_lexical_index
+from utils.vector_snapshot import VectorSnapshot, ensure_vector_snapshot
+from utils.routing import route_decision
+from utils.parallel import with_timeout
+from utils.metrics import MetricsCallbackHandler, cache_lookups, request_duration, span, timed_node
+from utils.startup import log_startup_report, startup_phase
+from graph_state import GraphState
+from langgraph.graph import StateGraph, END
+
+# Agents
+from Agents.router_agent import router_agent
+from Agents.article_search_agent import article_search_agent
+from Agents.case_law_agent import case_law_agent
+from Agents.historical_context_agent import historical_context_agent
+from Agents.synthesizer_agent import synthesizer_agent
+
+# Persistent storage path for Chroma DB
+CHROMA_DIR = os.getenv("CHROMA_DIR", "./chroma_store")
+# Content hashes of indexed files and chunks, used for incremental re-indexing
+MANIFEST_PATH = os.path.join(CHROMA_DIR, "ingest_manifest.json")
+# Article/clause/schedule identifier -> text and chunk IDs, built during ingestion
+ARTICLE_INDEX_PATH = os.path.join(CHROMA_DIR, "article_index.json")
+# BM25 inverted index over the stored chunks, rebuilt when the corpus changes
+LEXICAL_INDEX_DIR = os.path.join(CHROMA_DIR, "lexical_index")
+# Memory-mapped flat copy of the vectors, queried by the "flat" backends and by HTTP server workers
+VECTOR_SNAPSHOT_DIR = os.path.join(CHROMA_DIR, "vector_snapshot")
+SNAPSHOT_QUANTIZATION = "int8" if VECTOR_BACKEND == "flat-int8" else None
+
+# Directory whose PDFs make up the corpus
+PDF_DIR = "./pdf"
+
+NO_ANSWER = "No answer could be generated."
+
+# Logger setup
+logger = setup_logger(__name__)
+
+
+def list_pdf_files(pdf_dir=PDF_DIR):
+    """All PDFs in ``pdf_dir``, sorted so chunk order is deterministic."""
+    return sorted(glob.glob(os.path.join(pdf_dir, "*.pdf")))
+
+
+def get_retriever(pdf_files, article_index=None):
+    """Open the Chroma DB and incrementally sync it with ``pdf_files``.
+
+    Only new or changed files are parsed and embedded; chunks from deleted
+    files are removed (see ``utils.ingestion.sync_corpus``). ``article_index``
+    is updated alongside when given. With a ``flat`` ``VECTOR_BACKEND``
+    queries go to the vector snapshot exported from Chroma. In ``hybrid``
+    retrieval mode the BM25 index is brought up to date too and a
+    ``HybridRetriever`` is returned.
+    """
+    try:
+        logger.info("Opening Chroma DB at %s", CHROMA_DIR)
+        # Deferred: importing the Chroma integration pulls in chromadb
+        from langchain_community.vectorstores import Chroma
+        vectorstore = Chroma(
+            persist_directory=CHROMA_DIR,
+            embedding_function=get_embeddings()
+        )
+        manifest = sync_corpus(vectorstore, pdf_files, MANIFEST_PATH, article_index=article_index)
+        if VECTOR_BACKEND != "chroma":
+            vectorstore = ensure_vector_snapshot(
+                vectorstore, VECTOR_SNAPSHOT_DIR, manifest["corpus_version"], get_embeddings(), SNAPSHOT_QUANTIZATION
+            )
+
+        lexical_index = None
+        if RETRIEVAL_MODE == "hybrid":
+            lexical_index = ensure_lexical_index(vectorstore, LEXICAL_INDEX_DIR, manifest["corpus_version"])
+        retriever = make_retriever(vectorstore, lexical_index)
+
+        logger.info("Retriever initialized successfully (%s, %s)", RETRIEVAL_MODE, VECTOR_BACKEND)
+        return retriever
+
+    except Exception as e:
+        logger.error("Failed to initialize retriever: %s", str(e), exc_info=True)
+        raise
+
+
+def make_retriever(vectorstore, lexical_index=None):
+    """Hybrid retriever when a BM25 index is given, else plain vector search."""
+    if lexical_index is not None:
+        return HybridRetriever(
+            vectorstore=vectorstore, lexical_index=lexical_index,
+            k=RETRIEVAL_K, fetch_k=RETRIEVAL_FETCH_K,
+        )
+    return vectorstore.as_retriever(search_kwargs={"k": RETRIEVAL_K})
+
+
+def get_snapshot_retriever():
+    """Open the read-only vector snapshot and BM25 index written by ``prepare_indexes``.
+
+    Nothing is ingested or rebuilt and Chroma is never opened, so several
+    worker processes can serve from the same memory-mapped files.
+    """
+    vectorstore = VectorSnapshot.load(VECTOR_SNAPSHOT_DIR, get_embeddings())
+    if vectorstore is None:
+        raise RuntimeError(f"No vector snapshot in {VECTOR_SNAPSHOT_DIR}; run prepare_indexes() first")
+    lexical_index = None
+    if RETRIEVAL_MODE == "hybrid":
+        lexical_index = LexicalIndex.load(LEXICAL_INDEX_DIR)
+        if lexical_index is None or lexical_index.corpus_version != vectorstore.corpus_version:
+            raise RuntimeError(f"Lexical index in {LEXICAL_INDEX_DIR} does not match the vector snapshot")
+    logger.info("Opened vector snapshot with %d chunks (%s)", len(vectorstore.chunk_ids), RETRIEVAL_MODE)
+    return make_retriever(vectorstore, lexical_index)
+
+
+def prepare_indexes(pdf_files=None):
+    """Sync the corpus and write every on-disk index, including the vector snapshot.
+
+    Run once before starting server workers, which then open the indexes
+    read-only with ``Runtime(from_snapshot=True)``.
+    """
+    os.makedirs(CHROMA_DIR, exist_ok=True)
+    retriever = get_retriever(
+        pdf_files if pdf_files is not None else list_pdf_files(),
+        article_index=ArticleIndex(ARTICLE_INDEX_PATH),
+    )
+    corpus_version = load_manifest(MANIFEST_PATH)["corpus_version"]
+    # The flat backends already exported it inside get_retriever
+    if VECTOR_BACKEND == "chroma":
+        ensure_vector_snapshot(retriever.vectorstore, VECTOR_SNAPSHOT_DIR, corpus_version, get_embeddings())
+    ensure_case_store(CASE_LAW_DATA_DIR, CASE_LAW_STORE_DIR, get_embeddings(), EMBEDDING_MODEL)
+    ensure_timeline(AMENDMENTS_DATA_DIR, AMENDMENT_TIMELINE_PATH)
+    logger.info("Indexes prepared for corpus version %s", corpus_version)
+
+
+def build_workflow(checkpointer=None):
+    """Build and compile the LangGraph workflow, checkpointing each step when ``checkpointer`` is given."""
+    try:
+        logger.info("Building the LangGraph...")
+        workflow = StateGraph(GraphState)
+
+        # Register nodes
+        # Every node is timed into the stage latency histogram (utils.metrics)
+        workflow.add_node("router", timed_node(router_agent, "node:router"))
+        workflow.add_node("article_search", timed_node(
+            with_timeout(article_search_agent, "relevant_articles"), "node:article_search"))
+        workflow.add_node("case_law", timed_node(
+            with_timeout(case_law_agent, "relevant_cases"), "node:case_law"))
+        workflow.add_node("historical_context", timed_node(
+            with_timeout(historical_context_agent, "historical_context"), "node:historical_context"))
+        workflow.add_node("synthesizer", timed_node(synthesizer_agent, "node:synthesizer"))
+
+        # Define entry & routing
+        workflow.set_entry_point("router")
+        workflow.add_conditional_edges("router", route_decision, {
+            "article_search": "article_search",
+            "case_law": "case_law",
+            "historical_context": "historical_context",
+            "synthesizer": "synthesizer"
+        })
+
+        # Define transitions (selected agents run as parallel branches and join at the synthesizer)
+        workflow.add_edge("article_search", "synthesizer")
+        workflow.add_edge("case_law", "synthesizer")
+        workflow.add_edge("historical_context", "synthesizer")
+        workflow.add_edge("synthesizer", END)
+
+        app = workflow.compile(checkpointer=checkpointer)
+        logger.info("Graph compiled successfully.")
+        return app
+    except Exception as e:
+        logger.error("Error building graph: %s", str(e), exc_info=True)
+        raise
+
+
+async def run_query(app, runtime, query, on_token=None, callbacks=None, thread_id=None):
+    """Run the workflow for one query; returns ``(answer, errors, articles)``.
+
+    ``errors`` lists the failures agents recovered from (a failed router
+    call, a timed-out branch, ...); an answer produced despite them is
+    degraded and must not be cached. ``articles`` are the chunk references
+    article search retrieved, which a cached answer keeps for follow-ups.
+
+    ``runtime`` reaches the nodes through ``config["configurable"]``, so the
+    graph state holds only the query, chunk references and the answer. When
+    ``on_token`` is given, synthesizer tokens are forwarded to it as they
+    are generated and the time to first token is logged. ``callbacks`` are
+    LangChain callback handlers attached to every run in the graph.
+    ``thread_id`` selects the checkpoint thread of a checkpointed graph.
+    """
+    logger.info("Running workflow with query: %s", query)
+    # Every per-turn key is reset so a checkpointed thread never carries over
+    # the previous turn's references for a branch the router skips this time.
+    inputs = {
+        "query": query, "relevant_articles": [], "relevant_cases": [], "historical_context": [],
+        "routing_decision": {}, "final_answer": "", "errors": None,
+    }
+    final_state = {}
+    errors = []
+    articles = []
+    start = time.perf_counter()
+    first_token_at = None
+
+    async def forward_token(token):
+        nonlocal first_token_at
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+            logger.info("Time to first token: %.3fs", first_token_at - start)
+        await on_token(token)
+
+    config = {"configurable": {"runtime": runtime, "on_token": forward_token if on_token else None}}
+    if thread_id is not None:
+        config["configurable"]["thread_id"] = thread_id
+    if callbacks:
+        config["callbacks"] = callbacks
+
+    try:
+        async for s in app.astream(inputs, config=config):
+            logger.debug("Current State Keys: %s", list(s.keys()))
+            final_state.update(s)
+            for update in s.values():
+                errors.extend((update or {}).get("errors") or [])
+                articles = (update or {}).get("relevant_articles") or articles
+
+        logger.info("Query completed in %.3fs", time.perf_counter() - start)
+        if errors:
+            logger.warning("Answer is degraded by agent errors: %s", errors)
+
+        if "synthesizer" in final_state:
+            return final_state["synthesizer"]["final_answer"], errors, articles
+        elif "__end__" in final_state:
+            return final_state["__end__"]["final_answer"], errors, articles
+        else:
+            logger.warning("No final answer produced. Keys: %s", final_state.keys())
+            return NO_ANSWER, errors + ["no final answer"], articles
+    except Exception as e:
+        logger.error("Error during workflow execution: %s", str(e), exc_info=True)
+        return f"Error: {e}", errors + [str(e)], articles
+
+
+class Runtime:
+    """Process-wide resources shared by every CLI and chat session.
+
+    Holds the embedder, vector store, retriever and compiled graph so they are
+    built exactly once per process rather than once per session; the LLM
+    client is shared through ``config.get_llm`` and built by ``warmup``.
+    With ``from_snapshot`` the indexes prepared by ``prepare_indexes`` are
+    opened read-only instead of syncing the corpus into Chroma. Graph nodes
+    reach these resources through the run config, not the graph state.
+    """
+
+    def __init__(self, pdf_files=None, from_snapshot=False):
+        self.embeddings = get_embeddings()
+
+        os.makedirs(CHROMA_DIR, exist_ok=True)
+        self.article_index = ArticleIndex(ARTICLE_INDEX_PATH)
+
+        logger.info("Initializing retriever...")
+        with startup_phase("retriever"):
+            if from_snapshot:
+                self.retriever = get_snapshot_retriever()
+            else:
+                self.retriever = get_retriever(
+                    pdf_files if pdf_files is not None else list_pdf_files(),
+                    article_index=self.article_index,
+                )
+        self.vectorstore = self.retriever.vectorstore
+        # Snapshot workers only open what prepare_indexes published; rebuilding here would race the other workers
+        with startup_phase("case law store"):
+            self.case_store = (
+                load_case_store(CASE_LAW_STORE_DIR, self.embeddings, EMBEDDING_MODEL) if from_snapshot
+                else ensure_case_store(CASE_LAW_DATA_DIR, CASE_LAW_STORE_DIR, self.embeddings, EMBEDDING_MODEL)
+            )
+        with startup_phase("amendment timeline"):
+            self.timeline = (
+                load_timeline(AMENDMENT_TIMELINE_PATH) if from_snapshot
+                else ensure_timeline(AMENDMENTS_DATA_DIR, AMENDMENT_TIMELINE_PATH)
+            )
+        # Changes whenever the indexed corpus does; caches key on it
+        self.corpus_version = load_manifest(MANIFEST_PATH)["corpus_version"]
+        self._manifest_mtime = os.path.getmtime(MANIFEST_PATH)
+
+        self.answer_cache = (
+            AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL_SECONDS, SEMANTIC_CACHE_THRESHOLD)
+            if ANSWER_CACHE else None
+        )
+        self.conversation_cache = (
+            ConversationCache(CONVERSATION_CACHE_SESSIONS, CONVERSATION_CACHE_TTL_SECONDS, CONVERSATION_MAX_CHUNKS)
+            if CONVERSATION_CACHE else None
+        )
+        self.single_flight = SingleFlight() if SINGLE_FLIGHT else None
+
+        logger.info("Compiling workflow...")
+        with startup_phase("workflow"):
+            self.graph = build_workflow()
+        # Compiled with the SQLite checkpointer on the first session query when CHECKPOINT_DB is set
+        self._session_graph = None
+        self._session_graph_lock = asyncio.Lock()
+
+    @property
+    def llm(self):
+        return get_llm()
+
+    def warmup(self):
+        """Build the LLM client and run one dummy embedding and retrieval so the first user query is not cold."""
+        start = time.perf_counter()
+        try:
+            warmup_providers()
+            with startup_phase("retriever warm-up"):
+                self.retriever.invoke("Article 21 protection of life and personal liberty")
+            logger.info("Runtime warm-up completed in %.3fs", time.perf_counter() - start)
+        except Exception as e:
+            logger.warning("Runtime warm-up failed: %s", str(e), exc_info=True)
+
+    def current_corpus_version(self):
+        """Corpus version, re-read only when the manifest file changes on disk."""
+        try:
+            mtime = os.path.getmtime(MANIFEST_PATH)
+        except OSError:
+            return self.corpus_version
+        if mtime != self._manifest_mtime:
+            self._manifest_mtime = mtime
+            self.corpus_version = load_manifest(MANIFEST_PATH)["corpus_version"]
+        return self.corpus_version
+
+    async def session_graph(self):
+        """The graph compiled with the SQLite checkpointer; the plain graph when checkpointing is off or unavailable."""
+        if not CHECKPOINT_DB:
+            return self.graph
+        async with self._session_graph_lock:
+            if self._session_graph is None:
+                try:
+                    # Optional dependency: langgraph-checkpoint-sqlite (pulls in aiosqlite)
+                    import aiosqlite
+                    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+                    # Server workers share the file: wait for a writer instead of failing, and let readers run alongside
+                    connection = aiosqlite.connect(CHECKPOINT_DB, timeout=CHECKPOINT_BUSY_TIMEOUT_SECONDS)
+                    # aiosqlite runs the connection on its own thread; do not let it hold the process open at exit
+                    connection.daemon = True
+                    connection = await connection
+                    await connection.execute("PRAGMA journal_mode=WAL")
+                    self._session_graph = build_workflow(checkpointer=AsyncSqliteSaver(connection))
+                    logger.info("Checkpointing sessions to %s", CHECKPOINT_DB)
+                except Exception as e:
+                    logger.error("Session checkpointing disabled: %s", str(e), exc_info=True)
+                    self._session_graph = self.graph
+        return self._session_graph
+
+    async def run_query(self, query, on_token=None, callbacks=None, session_id=None, use_cache=True):
+        """Answer ``query``; see ``run_query_with_outcome``."""
+        answer, _ = await self.run_query_with_outcome(query, on_token, callbacks, session_id, use_cache)
+        return answer
+
+    async def run_query_with_outcome(self, query, on_token=None, callbacks=None, session_id=None, use_cache=True):
+        """``(answer, outcome)`` for ``query``, from the answer cache when possible, else from the graph.
+
+        Each call gets its own call ID for log correlation, and its cache,
+        node, retriever and LLM timings are recorded in ``utils.metrics``.
+        With ``session_id`` and ``CHECKPOINT_DB`` set, the graph state of every
+        turn is checkpointed under that ID. Concurrent identical queries share
+        one graph execution, except follow-ups, which depend on their session.
+        ``use_cache=False`` skips the answer-cache lookup and runs the graph
+        without joining an identical query, e.g. when retrying a query whose
+        first answer was degraded; a clean answer is still stored. The outcome
+        is the ``request_duration`` label, see ``_answer``.
+        """
+        new_call_id()
+        start = time.perf_counter()
+        callbacks = list(callbacks or []) + [MetricsCallbackHandler()]
+        answer, outcome = await self._answer(query, on_token, callbacks, session_id, use_cache)
+        request_duration.observe(time.perf_counter() - start, outcome=outcome)
+        return answer, outcome
+
+    async def _run_graph(self, query, on_token, callbacks, session_id=None):
+        graph = await self.session_graph() if session_id is not None else self.graph
+        answer, errors, articles = await run_query(
+            graph, self, query, on_token=on_token, callbacks=callbacks, thread_id=session_id,
+        )
+        if answer == NO_ANSWER or answer.startswith("Error"):
+            return answer, "error", articles
+        # Answered without some of its context; never cached
+        return answer, "degraded" if errors else "graph", articles
+
+    async def _shared_graph(self, key, query, on_token, callbacks, session_id=None, coalesce=True):
+        """Run the graph, or join an identical query already running (outcome ``coalesced``).
+
+        Returns ``(answer, outcome, articles)`` like ``_run_graph``; with
+        ``coalesce=False`` the graph always runs for this call alone.
+        """
+        if self.single_flight is None or not coalesce:
+            return await self._run_graph(query, on_token, callbacks, session_id)
+
+        async def execute(broadcast):
+            return await self._run_graph(query, broadcast, callbacks, session_id)
+
+        (answer, outcome, articles), joined = await self.single_flight.run(key, execute, on_token)
+        cache_lookups.inc(cache="single_flight", result="hit" if joined else "miss")
+        logger.info("Single-flight %s; stats: %s", "joined" if joined else "executed", self.single_flight.stats())
+        if not joined:
+            return answer, outcome, articles
+        # Follow-ups in this session continue from the shared retrieval
+        self._remember_turn(session_id, (query, articles) if articles else None)
+        return answer, "coalesced" if outcome == "graph" else outcome, articles
+
+    def _remember_turn(self, session_id, turn):
+        """Make ``turn`` (topic, chunk references) the session's last retrieval, or forget it when ``None``."""
+        if self.conversation_cache is None or session_id is None:
+            return
+        if turn is None:
+            self.conversation_cache.forget(session_id)
+        else:
+            self.conversation_cache.put(session_id, *turn)
+
+    async def _answer(self, query, on_token, callbacks, session_id=None, use_cache=True):
+        """``(answer, outcome)``; outcome is ``cache_hit``, ``graph``, ``coalesced``, ``degraded`` or ``error``.
+
+        Only ``graph`` answers are stored in the answer cache.
+        """
+        if self.conversation_cache is not None:
+            self.conversation_cache.ensure_version(self.current_corpus_version())
+            if self.conversation_cache.follow_up_turn(session_id, query) is not None:
+                # Depends on this session's earlier turns, so it is neither cached nor shared
+                answer, outcome, _ = await self._run_graph(query, on_token, callbacks, session_id)
+                return answer, outcome
+            # A new topic: later follow-ups must not fall back to the previous one's chunks
+            self.conversation_cache.forget(session_id)
+
+        key = normalize_query(query)
+        if self.answer_cache is None:
+            answer, outcome, _ = await self._shared_graph(key, query, on_token, callbacks, session_id, use_cache)
+            return answer, outcome
+
+        self.answer_cache.ensure_version(self.current_corpus_version())
+        entry, vector = None, None
+        references = query_references(query)
+
+        # Entries are (answer, turn): the turn restores the conversation cache on a hit
+        if use_cache:
+            with span("answer_cache:exact"):
+                entry = self.answer_cache.get_exact(key)
+            if entry is None:
+                with span("embed_query"):
+                    vector = await self.embeddings.aembed_query(query)
+                with span("answer_cache:semantic"):
+                    entry, score = self.answer_cache.get_semantic(key, vector, references)
+                logger.debug("Best semantic cache similarity: %.3f", score)
+            cache_lookups.inc(cache="answer", result="hit" if entry is not None else "miss")
+
+        if entry is not None:
+            answer, turn = entry
+            logger.info("Answer cache hit; stats: %s", self.answer_cache.stats())
+            # Follow-ups to a cached answer continue from the retrieval it was generated from
+            self._remember_turn(session_id, turn)
+            if on_token:
+                await on_token(answer)
+            return answer, "cache_hit"
+
+        answer, outcome, articles = await self._shared_graph(key, query, on_token, callbacks, session_id, use_cache)
+        if outcome == "graph":
+            self.answer_cache.put(key, vector, (answer, (query, articles) if articles else None), references)
+        logger.info("Answer cache miss; stats: %s", self.answer_cache.stats())
+        return answer, outcome
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime():
+    """Return the process-wide Runtime, building and warming it on first use.
+
+    Thread-safe: concurrent callers block on the lock until the single
+    instance is ready instead of each building their own.
+    """
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                runtime = Runtime()
+                runtime.warmup()
+                _runtime = runtime
+                log_startup_report()
+    return _runtime
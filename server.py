@@ -0,0 +1,168 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from config import MAX_CONCURRENT_QUERIES, SERVER_HOST, SERVER_PORT, SERVER_WORKERS
+from logger_context import call_id_var, new_call_id
+from logger_util import setup_logger
+from utils.metrics import PROMETHEUS_CONTENT_TYPE, render_prometheus
+from utils.startup import log_startup_report
+
+# Logger setup
+logger = setup_logger(__name__)
+
+# Caps in-flight graph executions per worker; further requests wait here.
+query_semaphore = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+
+# Set by the warm-up thread of each worker process
+_runtime = None
+_startup_error = None
+
+
+def _build_runtime():
+    global _runtime, _startup_error
+    # Start-up logs of this worker share one call ID
+    new_call_id()
+    try:
+        # Deferred so the supervisor process never loads the graph or models
+        from runtime import Runtime
+        runtime = Runtime(from_snapshot=True)
+        runtime.warmup()
+        _runtime = runtime
+        log_startup_report()
+        logger.info("Worker ready")
+    except Exception as e:
+        _startup_error = str(e)
+        logger.error("Worker start-up failed: %s", str(e), exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm up in the background so /healthz answers while the worker loads.
+    threading.Thread(target=_build_runtime, name="runtime-warmup", daemon=True).start()
+    yield
+
+
+app = FastAPI(title="Indian Constitution Assistant", lifespan=lifespan)
+
+
+class QueryRequest(BaseModel):
+    query: str
+    stream: bool = False
+    # Checkpoint thread to continue when CHECKPOINT_DB is set
+    session_id: Optional[str] = None
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the worker process is up and handling requests."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: the runtime is built and warmed up."""
+    if _runtime is not None:
+        return {"status": "ready"}
+    if _startup_error is not None:
+        return JSONResponse({"status": "failed", "error": _startup_error}, status_code=503)
+    return JSONResponse({"status": "warming up"}, status_code=503)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics of this worker process."""
+    return Response(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+async def _stream_answer(query, session_id=None):
+    """Server-sent events: one ``token`` event per synthesizer token, then ``done`` (or ``error``)."""
+    tokens = asyncio.Queue()
+    start = time.perf_counter()
+
+    async def on_token(token):
+        await tokens.put(token)
+
+    async def run():
+        async with query_semaphore:
+            answer = await _runtime.run_query(query, on_token=on_token, session_id=session_id)
+        return answer, call_id_var.get()
+
+    task = asyncio.create_task(run())
+    task.add_done_callback(lambda _: tokens.put_nowait(None))
+    try:
+        while (token := await tokens.get()) is not None:
+            yield _sse("token", {"token": token})
+        answer, call_id = task.result()
+        yield _sse("done", {
+            "answer": answer, "call_id": call_id, "latency_s": round(time.perf_counter() - start, 3),
+        })
+    except Exception as e:
+        logger.error("Streaming query failed: %s", str(e), exc_info=True)
+        yield _sse("error", {"error": str(e)})
+    finally:
+        # The client went away before the answer was complete
+        if not task.done():
+            task.cancel()
+
+
+@app.post("/query")
+async def query(body: QueryRequest, request: Request):
+    """Answer one query as JSON, or as a server-sent event stream when requested."""
+    if _runtime is None:
+        return JSONResponse({"error": "Service is not ready"}, status_code=503)
+    if not body.query.strip():
+        return JSONResponse({"error": "Query must not be empty"}, status_code=400)
+
+    if body.stream or "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(_stream_answer(body.query, body.session_id), media_type="text/event-stream")
+
+    start = time.perf_counter()
+    async with query_semaphore:
+        answer = await _runtime.run_query(body.query, session_id=body.session_id)
+    return {"answer": answer, "call_id": call_id_var.get(), "latency_s": round(time.perf_counter() - start, 3)}
+
+
+def _prepare_indexes():
+    from runtime import prepare_indexes
+    prepare_indexes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the query API from several worker processes.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--skip-prepare", action="store_true",
+                        help="serve the existing indexes without syncing the corpus first")
+    args = parser.parse_args()
+
+    if not args.skip_prepare:
+        # Ingest and write the shared indexes in a short-lived process so the
+        # supervisor does not keep the embedder and Chroma in memory.
+        process = multiprocessing.get_context("spawn").Process(target=_prepare_indexes, name="prepare-indexes")
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            logger.error("Index preparation failed with exit code %s", process.exitcode)
+            sys.exit(1)
+
+    import uvicorn
+    logger.info("Starting %d workers on %s:%d", args.workers, args.host, args.port)
+    uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers, log_config=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import unittest
+from runtime import Runtime
+from utils.answer_cache import AnswerCache
+from utils.chunk_refs import make_ref
+from utils.conversation_cache import ConversationCache
+from utils.stand_ins import HashingEmbeddings
+
+ARTICLE_21 = [make_ref("chunk", "article-21"), make_ref("chunk", "article-21-clause-2")]
+
+
+def cached_runtime():
+    """A Runtime with only the caches ``_answer`` consults, and a graph that retrieves ``ARTICLE_21``."""
+    runtime = Runtime.__new__(Runtime)
+    runtime.conversation_cache = ConversationCache(max_sessions=8, ttl_seconds=60, max_chunks=8)
+    runtime.answer_cache = AnswerCache(max_size=8, ttl_seconds=60, threshold=0.95)
+    runtime.single_flight = None
+    runtime.embeddings = HashingEmbeddings()
+    runtime.current_corpus_version = lambda: "v1"
+    runtime.graph_runs = []
+
+    async def run_graph(key, query, on_token, callbacks, session_id=None, coalesce=True):
+        # Article search records the session's retrieval, as the real node does
+        runtime.graph_runs.append(query)
+        runtime.conversation_cache.put(session_id, query, ARTICLE_21)
+        return f"answer to {query}", "graph", ARTICLE_21
+
+    runtime._shared_graph = run_graph
+    return runtime
+
+
+class FollowUpAfterCacheHitTest(unittest.IsolatedAsyncioTestCase):
+    async def test_cache_hit_keeps_retrieval_for_follow_ups(self):
+        runtime = cached_runtime()
+        await runtime._answer("What is Article 21?", None, None, session_id="first")
+        answer, outcome = await runtime._answer("What is Article 21?", None, None, session_id="second")
+
+        self.assertEqual(outcome, "cache_hit")
+        self.assertEqual(runtime.graph_runs, ["What is Article 21?"])
+        turn = runtime.conversation_cache.follow_up_turn("second", "and what about its exceptions?")
+        self.assertEqual(turn, ("What is Article 21?", ARTICLE_21))
+
+    async def test_cache_hit_replaces_previous_topic(self):
+        runtime = cached_runtime()
+        await runtime._answer("What is Article 21?", None, None, session_id="first")
+        runtime.conversation_cache.put("second", "emergency provisions", [make_ref("chunk", "article-352")])
+        await runtime._answer("What is Article 21?", None, None, session_id="second")
+
+        self.assertEqual(runtime.conversation_cache.last_turn("second"), ("What is Article 21?", ARTICLE_21))
+
+
+class FollowUpClassificationTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = ConversationCache(max_sessions=8, ttl_seconds=60, max_chunks=8)
+        self.cache.put("session", "What does Article 21 say?", ARTICLE_21)
+
+    def test_follow_ups(self):
+        for query in ("and what about its exceptions?", "Also, who enforces it?", "tell me more about it",
+                      "explain it in simpler terms"):
+            with self.subTest(query=query):
+                self.assertIsNotNone(self.cache.follow_up_turn("session", query))
+
+    def test_standalone_questions_with_pronouns(self):
+        for query in ("What is the Preamble and why is it important?", "Explain the Preamble and its significance",
+                      "What is federalism and how does it work?", "What about Article 22?"):
+            with self.subTest(query=query):
+                self.assertIsNone(self.cache.follow_up_turn("session", query))
+
+    def test_no_session(self):
+        self.assertIsNone(self.cache.follow_up_turn("other", "tell me more about it"))
+        self.assertIsNone(self.cache.follow_up_turn(None, "tell me more about it"))
+
+
+if __name__ == "__main__":
+    unittest.main()
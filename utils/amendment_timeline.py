@@ -0,0 +1,244 @@
+import glob
+import json
+import os
+import pickle
+import re
+from bisect import bisect_left, bisect_right
+from typing import List, Optional
+from logger_util import setup_logger
+from utils.case_law_store import sources_version
+from utils.references import extract_article_refs
+
+logger = setup_logger(__name__)
+
+TIMELINE_FORMAT = 1
+
+_YEAR = r"(1[89]\d\d|20\d\d)"
+_RANGE = re.compile(rf"(?:between|from)\s+{_YEAR}\s+(?:and|to|until|till)\s+{_YEAR}|{_YEAR}\s*[-–]\s*{_YEAR}")
+_SINCE = re.compile(rf"\b(?:since|after|from)\s+{_YEAR}")
+_BEFORE = re.compile(rf"\b(before|until|till|prior to|up to)\s+{_YEAR}")
+_DECADE = re.compile(r"\b(1[89]\d|20\d)0s\b")
+_YEAR_ONLY = re.compile(rf"\b{_YEAR}\b")
+_AMENDMENT_NUMBER = re.compile(r"\b(\d{1,3})(?:st|nd|rd|th)\s+(?:constitutional\s+)?amendment", re.IGNORECASE)
+
+_ONES = ["", "first", "second", "third", "fourth", "fifth", "sixth", "seventh", "eighth", "ninth"]
+_TEENS = ["tenth", "eleventh", "twelfth", "thirteenth", "fourteenth", "fifteenth",
+          "sixteenth", "seventeenth", "eighteenth", "nineteenth"]
+_TENS = ["", "", "twent", "thirt", "fort", "fift", "sixt", "sevent", "eight", "ninet"]
+
+
+def _ordinal_words(n: int) -> str:
+    """English ordinal for 1-199, e.g. 42 -> "forty-second", 101 -> "hundred and first"."""
+    if n >= 100:
+        return "hundredth" if n == 100 else f"hundred and {_ordinal_words(n - 100)}"
+    if n < 10:
+        return _ONES[n]
+    if n < 20:
+        return _TEENS[n - 10]
+    tens, ones = divmod(n, 10)
+    return f"{_TENS[tens]}ieth" if not ones else f"{_TENS[tens]}y-{_ONES[ones]}"
+
+
+_WORD_NUMBERS = {_ordinal_words(n): n for n in range(1, 200)}
+_WORD_AMENDMENT = re.compile(
+    r"\b((?:one\s+)?hundred(?:th|\s+and\s+[a-z-]+)|[a-z]+-[a-z]+|[a-z]+)\s+(?:constitutional\s+)?amendment",
+    re.IGNORECASE,
+)
+
+# Descriptive phrases mapped to the provision whose history they ask about;
+# a trailing "*" marks a stem that matches any word ending ("abrogated", "abrogation")
+TOPIC_ARTICLES = {
+    "abrogat*": "370",
+    "jammu and kashmir": "370",
+    "special status": "370",
+    "right to property": "300A",
+    "fundamental duties": "51A",
+    "anti-defection": "SCHEDULE-10",
+    "defection": "SCHEDULE-10",
+    "panchayat*": "243",
+    "municipalit*": "243P",
+    "goods and services tax": "279A",
+    "gst": "279A",
+    "voting age": "326",
+    "emergenc*": "352",
+    "preamble": "PREAMBLE",
+    "right to education": "21A",
+    "ninth schedule": "SCHEDULE-9",
+    "eighth schedule": "SCHEDULE-8",
+}
+
+
+def _topic_pattern(topic: str) -> re.Pattern:
+    """Whole-word pattern for a ``TOPIC_ARTICLES`` phrase, so "gst" does not match inside "amongst"."""
+    stem = topic.endswith("*")
+    words = r"\s+".join(re.escape(word) for word in topic.rstrip("*").split())
+    return re.compile(rf"\b{words}" + (r"\w*" if stem else r"\b"))
+
+
+_TOPIC_PATTERNS = [(_topic_pattern(topic), article) for topic, article in TOPIC_ARTICLES.items()]
+
+
+def extract_amendment_numbers(text: str) -> List[int]:
+    """Amendment numbers named in ``text``, as digits ("42nd amendment") or words ("forty-second amendment")."""
+    numbers = [int(n) for n in _AMENDMENT_NUMBER.findall(text)]
+    for words in _WORD_AMENDMENT.findall(text.lower()):
+        number = _WORD_NUMBERS.get(re.sub(r"^one\s+", "", re.sub(r"\s+", " ", words)))
+        if number and number not in numbers:
+            numbers.append(number)
+    return numbers
+
+
+def parse_history_query(query: str) -> dict:
+    """Articles, amendment numbers and a year range mentioned in ``query``."""
+    lowered = query.lower()
+    articles = extract_article_refs(query)
+    for pattern, article in _TOPIC_PATTERNS:
+        if article not in articles and pattern.search(lowered):
+            articles.append(article)
+
+    numbers = extract_amendment_numbers(query)
+
+    start = end = None
+    if (m := _RANGE.search(lowered)):
+        years = [int(y) for y in m.groups() if y]
+        start, end = min(years), max(years)
+    elif (m := _DECADE.search(lowered)):
+        start = int(m.group(1)) * 10
+        end = start + 9
+    else:
+        if (m := _SINCE.search(lowered)):
+            start = int(m.group(1))
+        if (m := _BEFORE.search(lowered)):
+            end = int(m.group(2)) - (1 if m.group(1) in ("before", "prior to") else 0)
+        if start is None and end is None and (m := _YEAR_ONLY.search(lowered)):
+            # A lone year next to an amendment number is its title year, not a filter
+            if not numbers:
+                start = end = int(m.group(1))
+    return {"articles": articles, "numbers": numbers, "start": start, "end": end}
+
+
+def _sort_key(event: dict):
+    return event["year"], event.get("date", "")
+
+
+def build_timeline(source_paths: List[str], path: str):
+    """Compile amendment/event JSONL files into the pickled indexes read by ``AmendmentTimeline``."""
+    events = []
+    for source in source_paths:
+        with open(source, "r", encoding="utf8") as f:
+            events.extend(json.loads(line) for line in f if line.strip())
+    events.sort(key=_sort_key)
+
+    by_article, by_number = {}, {}
+    for i, event in enumerate(events):
+        for article in event.get("articles") or []:
+            by_article.setdefault(article.upper(), []).append(i)
+        if event.get("number") is not None:
+            by_number[event["number"]] = i
+
+    payload = {
+        "format": TIMELINE_FORMAT,
+        "version": sources_version(source_paths),
+        "events": events,
+        "years": [event["year"] for event in events],
+        "by_article": by_article,
+        "by_number": by_number,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    logger.info(f"Built amendment timeline: {len(events)} events, {len(by_article)} provisions in {path}")
+
+
+class AmendmentTimeline:
+    """Chronological amendment/event store indexed by provision, number and year.
+
+    Events are kept sorted by date, so every index holds ascending positions
+    and year ranges resolve with two bisections.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+        self.version = payload["version"]
+        self.events = payload["events"]
+        self.years = payload["years"]
+        self.by_article = payload["by_article"]
+        self.by_number = payload["by_number"]
+
+    def __len__(self):
+        return len(self.events)
+
+    def _year_slice(self, start: Optional[int], end: Optional[int]) -> range:
+        lo = bisect_left(self.years, start) if start is not None else 0
+        hi = bisect_right(self.years, end) if end is not None else len(self.years)
+        return range(lo, hi)
+
+    def for_article(self, article: str, start: Optional[int] = None, end: Optional[int] = None) -> List[dict]:
+        positions = self.by_article.get(article.upper(), [])
+        window = self._year_slice(start, end)
+        return [self.events[i] for i in positions if window.start <= i < window.stop]
+
+    def between(self, start: Optional[int], end: Optional[int]) -> List[dict]:
+        return [self.events[i] for i in self._year_slice(start, end)]
+
+    def amendment(self, number: int) -> Optional[dict]:
+        i = self.by_number.get(number)
+        return self.events[i] if i is not None else None
+
+    def search_positions(self, query: str, limit: int = 10) -> List[int]:
+        """Positions in ``events`` of the events answering a history question, in chronological order."""
+        parsed = parse_history_query(query)
+        positions = set()
+        for number in parsed["numbers"]:
+            if number in self.by_number:
+                positions.add(self.by_number[number])
+        if parsed["articles"]:
+            window = self._year_slice(parsed["start"], parsed["end"])
+            for article in parsed["articles"]:
+                positions.update(i for i in self.by_article.get(article, []) if i in window)
+        elif not parsed["numbers"] and (parsed["start"] is not None or parsed["end"] is not None):
+            positions.update(self._year_slice(parsed["start"], parsed["end"]))
+        logger.debug(f"Timeline query {parsed} matched {len(positions)} events")
+        return sorted(positions)[:limit]
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        """Events answering a history question, in chronological order."""
+        return [self.events[i] for i in self.search_positions(query, limit)]
+
+
+def format_event(event: dict) -> str:
+    return f"{event.get('date', event['year'])}: {event['title']} - {event['summary']}"
+
+
+def timeline_source_files(data_dir: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(data_dir, "*.jsonl")))
+
+
+def ensure_timeline(data_dir: str, path: str):
+    """Load the compiled timeline, rebuilding it first if the source files changed."""
+    sources = timeline_source_files(data_dir)
+    if not sources:
+        logger.warning(f"No amendment sources found in {data_dir}")
+        return None
+    timeline = AmendmentTimeline(path) if os.path.exists(path) else None
+    if timeline is None or timeline.version != sources_version(sources):
+        build_timeline(sources, path)
+        timeline = AmendmentTimeline(path)
+    return timeline
+
+
+def load_timeline(path: str):
+    """Open the compiled timeline without checking or rebuilding it; ``None`` when there is none."""
+    if not os.path.exists(path):
+        logger.warning(f"No amendment timeline at {path}; run prepare_indexes() first")
+        return None
+    return AmendmentTimeline(path)
+
+
+if __name__ == "__main__":
+    from config import AMENDMENTS_DATA_DIR, AMENDMENT_TIMELINE_PATH
+
+    build_timeline(timeline_source_files(AMENDMENTS_DATA_DIR), AMENDMENT_TIMELINE_PATH)
@@ -0,0 +1,166 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from logger_util import setup_logger
+from utils.amendment_timeline import extract_amendment_numbers
+from utils.references import extract_article_refs
+
+logger = setup_logger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form used as the exact-match cache key."""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip(" ?.!")
+
+
+def query_references(query: str):
+    """Articles and amendment numbers named in ``query``; semantic hits must name exactly the same ones."""
+    return frozenset(extract_article_refs(query)), frozenset(extract_amendment_numbers(query))
+
+
+class ExactAnswerCache:
+    """LRU of final answers keyed by normalised query, with TTL eviction."""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        answer, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return answer
+
+    def put(self, key: str, answer: str):
+        self._entries[key] = (answer, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class SemanticAnswerCache:
+    """Reuses an answer when a new query embedding is within a cosine threshold.
+
+    Only entries naming the same articles and amendment numbers are eligible,
+    since "Article 14" and "Article 15" queries embed almost identically.
+    Entries are kept in insertion order and evicted oldest-first by size or TTL;
+    lookup is one matrix-vector product over the stored unit vectors.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, threshold: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._entries = OrderedDict()
+        self._matrix = None
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [key for key, (_, _, stored_at, _) in self._entries.items() if now - stored_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def get(self, vector, references=None):
+        self._expire()
+        if not self._entries:
+            return None, 0.0
+        if self._matrix is None:
+            self._matrix = np.stack([unit for unit, _, _, _ in self._entries.values()])
+        entries = list(self._entries.values())
+        scores = self._matrix @ self._unit(vector)
+        eligible = np.array([entry[3] == references for entry in entries])
+        if not eligible.any():
+            return None, 0.0
+        scores = np.where(eligible, scores, -np.inf)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None, float(scores[best])
+        return entries[best][1], float(scores[best])
+
+    def put(self, key: str, vector, answer: str, references=None):
+        self._entries.pop(key, None)
+        self._entries[key] = (self._unit(vector), answer, time.monotonic(), references)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        self._matrix = None
+
+    def clear(self):
+        self._entries.clear()
+        self._matrix = None
+
+
+class AnswerCache:
+    """Two-level cache of final answers in front of the graph.
+
+    Level one is an exact LRU on the normalised query; level two a semantic
+    cache over query embeddings. Both are dropped whenever the corpus version
+    (from the ingestion manifest) changes, so answers never outlive the
+    documents they were generated from. Cached values are opaque, so callers
+    may store the answer together with whatever produced it.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, threshold: float):
+        self.exact = ExactAnswerCache(max_size, ttl_seconds)
+        self.semantic = SemanticAnswerCache(max_size, ttl_seconds, threshold)
+        self.corpus_version = None
+        self.counts = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def ensure_version(self, corpus_version: str):
+        with self._lock:
+            if corpus_version != self.corpus_version:
+                if self.corpus_version is not None:
+                    logger.info("Corpus changed; invalidating answer cache")
+                self.exact.clear()
+                self.semantic.clear()
+                self.corpus_version = corpus_version
+
+    def get_exact(self, key: str):
+        with self._lock:
+            answer = self.exact.get(key)
+            if answer is not None:
+                self.counts["exact_hits"] += 1
+            return answer
+
+    def get_semantic(self, key: str, vector, references=None):
+        with self._lock:
+            answer, score = self.semantic.get(vector, references)
+            if answer is not None:
+                self.counts["semantic_hits"] += 1
+                # Promote so the next identical query skips the embedding step.
+                self.exact.put(key, answer)
+            else:
+                self.counts["misses"] += 1
+            return answer, score
+
+    def put(self, key: str, vector, answer: str, references=None):
+        with self._lock:
+            self.exact.put(key, answer)
+            if vector is not None:
+                self.semantic.put(key, vector, answer, references)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = sum(self.counts.values())
+            hits = self.counts["exact_hits"] + self.counts["semantic_hits"]
+            return dict(self.counts, hit_rate=hits / total if total else 0.0)
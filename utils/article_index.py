@@ -0,0 +1,179 @@
+import json
+import os
+import re
+from typing import Dict, List
+from logger_util import setup_logger
+from utils.references import normalize_article_id
+
+logger = setup_logger(__name__)
+
+SCHEDULE_NUMBERS = {
+    "FIRST": 1, "SECOND": 2, "THIRD": 3, "FOURTH": 4, "FIFTH": 5, "SIXTH": 6,
+    "SEVENTH": 7, "EIGHTH": 8, "NINTH": 9, "TENTH": 10, "ELEVENTH": 11, "TWELFTH": 12,
+}
+
+# "21. Protection of life...", "2[21A. Right to education.", "3[2A. [Sikkim ..."
+_ARTICLE_HEADING = re.compile(r"^(?:[\d*]+\[)?(\d{1,3})([A-Z]{0,3})\.\s+(\S.*)$")
+_SCHEDULE_HEADING = re.compile(r"^(?:\d+\[)?(" + "|".join(SCHEDULE_NUMBERS) + r")\s+SCHEDULE\s*$")
+_APPENDIX_HEADING = re.compile(r"^APPENDIX\s+[IVX]+\s*$")
+_RUNNING_HEADER = re.compile(r"^(THE\s+CONSTITUTION\s+OF\s+INDIA|\(.*\)|\d{1,3})$")
+_FOOTNOTE_RULE = re.compile(r"^_{10,}")
+# Clause starts at the beginning of a line or right after the heading dash: "—(1)", "2[(4A)"
+_CLAUSE_START = re.compile(r"(?:^|—\s*)(?:\d+\[)?\((\d{1,2}[A-Z]?)\)\s", re.MULTILINE)
+# Headings can skip omitted/repealed articles but never jump this far ahead.
+MAX_ARTICLE_GAP = 25
+
+
+def schedule_id(number: int) -> str:
+    return f"SCHEDULE-{number}"
+
+
+def _article_key(number: int, suffix: str):
+    return number, suffix
+
+
+class ArticleParser:
+    """Streaming splitter of constitution pages into article and schedule units.
+
+    Feed page Documents in order; running headers, page numbers and footnotes
+    are dropped. A numbered line opens a new article when it continues the
+    article sequence; the first heading with a marginal title ("1. Name and
+    territory of the Union.—") restarts the sequence after the table of
+    contents, after which headings must keep increasing (with small gaps for
+    omitted articles). Schedule headings switch to schedule units and
+    appendices end parsing. ``close()`` returns ``{unit_id: {"text", "pages"}}``
+    including numbered clauses as ``"19(2)"``-style units.
+    """
+
+    def __init__(self):
+        self.units = {}
+        self._current = None
+        self._last_article = (0, "")
+        self._in_schedules = False
+        self._seen_titled = False
+        self._done = False
+
+    def _open(self, unit_id: str, page: int, first_line: str):
+        self._flush()
+        self._current = {"id": unit_id, "lines": [first_line], "pages": [page, page]}
+
+    def _flush(self):
+        if self._current is None:
+            return
+        text = "\n".join(self._current["lines"]).strip()
+        existing = self.units.get(self._current["id"])
+        # Contents entries repeat headings with no body; keep the longest text.
+        if existing is None or len(text) > len(existing["text"]):
+            self.units[self._current["id"]] = {"text": text, "pages": self._current["pages"]}
+        self._current = None
+
+    def _accepts(self, number: int, suffix: str, line: str) -> bool:
+        if "—" in line and not self._seen_titled:
+            # The first heading with a marginal title ("1. Name and territory
+            # of the Union.—") starts the main text after the table of contents.
+            return True
+        if self._in_schedules:
+            return False
+        last_number, _ = self._last_article
+        return _article_key(number, suffix) > self._last_article and number <= last_number + MAX_ARTICLE_GAP
+
+    def feed(self, page):
+        if self._done:
+            return
+        page_number = page.metadata.get("page", 0)
+        for line in page.page_content.splitlines():
+            stripped = line.strip()
+            if _FOOTNOTE_RULE.match(stripped):
+                break
+            if not stripped or _RUNNING_HEADER.match(stripped):
+                continue
+            if _APPENDIX_HEADING.match(stripped):
+                self._flush()
+                self._done = True
+                return
+
+            schedule = _SCHEDULE_HEADING.match(stripped)
+            if schedule:
+                self._in_schedules = True
+                self._open(schedule_id(SCHEDULE_NUMBERS[schedule.group(1)]), page_number, stripped)
+                continue
+
+            heading = _ARTICLE_HEADING.match(stripped)
+            if heading and self._accepts(int(heading.group(1)), heading.group(2), stripped):
+                number, suffix = int(heading.group(1)), heading.group(2)
+                self._seen_titled |= "—" in stripped
+                self._in_schedules = False
+                self._last_article = _article_key(number, suffix)
+                self._open(normalize_article_id(str(number), suffix), page_number, stripped)
+                continue
+
+            if self._current is not None:
+                self._current["lines"].append(stripped)
+                self._current["pages"][1] = page_number
+
+    def close(self) -> Dict[str, dict]:
+        self._flush()
+        units = dict(self.units)
+        for unit_id, unit in self.units.items():
+            if unit_id.startswith("SCHEDULE-"):
+                continue
+            starts = list(_CLAUSE_START.finditer(unit["text"]))
+            for i, match in enumerate(starts):
+                end = starts[i + 1].start() if i + 1 < len(starts) else len(unit["text"])
+                clause_id = f"{unit_id}({match.group(1)})"
+                units.setdefault(clause_id, {"text": unit["text"][match.start():end].lstrip("— ").strip(), "pages": unit["pages"]})
+        return units
+
+
+class ArticleIndex:
+    """Exact index from article, clause or schedule identifier to text and chunk IDs.
+
+    Units are stored per source file so incremental ingestion can replace one
+    file's entries. Lookups go through a merged dict built on load; when several
+    files contain the same unit, the file with the most units (the complete
+    constitution rather than an extract) wins.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files = {}
+        self._merged = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf8") as f:
+                self.files = json.load(f)["files"]
+        self._merge()
+
+    def _merge(self):
+        merged = {}
+        for units in sorted(self.files.values(), key=len):
+            merged.update(units)
+        self._merged = merged
+
+    def set_file(self, source: str, units: Dict[str, dict]):
+        self.files[source] = units
+
+    def remove_file(self, source: str):
+        self.files.pop(source, None)
+
+    def save(self):
+        self._merge()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump({"files": self.files}, f)
+        os.replace(tmp_path, self.path)
+        logger.info("Saved article index with %d units to %s", len(self._merged), self.path)
+
+    def lookup(self, unit_id: str):
+        """Return ``{"text", "pages", "chunk_ids"}`` for an identifier such as "21A", "19(2)" or "SCHEDULE-8"."""
+        return self._merged.get(unit_id)
+
+    def __len__(self):
+        return len(self._merged)
+
+
+def attach_chunk_ids(units: Dict[str, dict], page_chunks: Dict[int, List[str]]):
+    """Record, for each unit, the chunks of every page it spans."""
+    for unit in units.values():
+        first, last = unit["pages"]
+        unit["chunk_ids"] = [cid for page in range(first, last + 1) for cid in page_chunks.get(page, [])]
+    return units
@@ -0,0 +1,325 @@
+import glob
+import hashlib
+import json
+import mmap
+import os
+import re
+from collections import deque
+from typing import Dict, List, Tuple
+import numpy as np
+from logger_util import setup_logger
+from utils.publish import current_dir, publish, staging_dir
+from utils.references import extract_article_refs
+
+try:  # C implementation when installed; the pure-Python automaton below is used otherwise
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+logger = setup_logger(__name__)
+
+# Petitioners too common to identify a case on their own
+_GENERIC_PARTIES = re.compile(r"^(?:state of|union of india|in re|the state|commissioner|home secretary)")
+_VERSUS = re.compile(r"\b(?:vs?|versus)\b")
+
+# Score contributed by each kind of lexical match
+NAME_WEIGHT = 3.0
+CITATION_WEIGHT = 3.0
+ARTICLE_WEIGHT = 1.0
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase alphanumeric tokens padded with spaces, so patterns only match whole words."""
+    tokens = re.findall(r"[a-z0-9]+", text.lower())
+    return " " + _VERSUS.sub("v", " ".join(tokens)) + " "
+
+
+class _Automaton:
+    """Minimal Aho-Corasick automaton mapping each pattern to a value."""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+
+    def add_word(self, word: str, value):
+        node = 0
+        for ch in word:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            node = nxt
+        self.out[node].append(value)
+
+    def make_automaton(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                state = self.fail[node]
+                while state and ch not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[nxt] = self.goto[state].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def iter(self, text: str):
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for value in self.out[node]:
+                yield i, value
+
+
+def _new_automaton():
+    return ahocorasick.Automaton() if ahocorasick is not None else _Automaton()
+
+
+def load_case_records(paths: List[str]) -> List[dict]:
+    """Read case records from JSONL files, or Parquet files when pyarrow is installed."""
+    records = []
+    for path in paths:
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            records.extend(pq.read_table(path).to_pylist())
+        else:
+            with open(path, "r", encoding="utf8") as f:
+                records.extend(json.loads(line) for line in f if line.strip())
+    return records
+
+
+def _dedupe(records: List[dict]) -> List[dict]:
+    """Merge records sharing a citation, or a name and year when uncited."""
+    merged, by_key = [], {}
+    for record in records:
+        citations = record.get("citations") or []
+        keys = [normalize_text(c) for c in citations] or [normalize_text(f"{record['name']} {record.get('year', '')}")]
+        existing = next((by_key[k] for k in keys if k in by_key), None)
+        if existing is None:
+            existing = dict(record, aliases=list(record.get("aliases") or []), citations=list(citations),
+                            articles=list(record.get("articles") or []))
+            merged.append(existing)
+        else:
+            for field in ("aliases", "citations", "articles"):
+                existing[field] += [v for v in record.get(field) or [] if v not in existing[field]]
+        for key in keys:
+            by_key[key] = existing
+    return merged
+
+
+def _case_patterns(record: dict) -> Dict[str, float]:
+    """Normalised name, alias, petitioner and citation patterns for one case."""
+    patterns = {normalize_text(record["name"]): NAME_WEIGHT}
+    for alias in record.get("aliases") or []:
+        patterns[normalize_text(alias)] = NAME_WEIGHT
+    petitioner = normalize_text(record["name"].split(" v. ")[0])
+    if " v. " in record["name"] and not _GENERIC_PARTIES.match(petitioner.strip()):
+        patterns.setdefault(petitioner, NAME_WEIGHT)
+    for citation in record.get("citations") or []:
+        patterns[normalize_text(citation)] = CITATION_WEIGHT
+    return patterns
+
+
+def sources_version(paths: List[str]) -> str:
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        with open(path, "rb") as f:
+            digest.update(os.path.basename(path).encode() + b"\0" + hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def embedding_signature(embeddings, model: str):
+    """``model:dimension`` of the vectors ``embeddings`` produces, or ``None`` without embeddings.
+
+    Part of the store version, so switching the embedding backend or model
+    rebuilds the headnote matrix instead of scoring against stale vectors.
+    """
+    if embeddings is None:
+        return None
+    return f"{model}:{len(embeddings.embed_query('dimension probe'))}"
+
+
+def store_version(source_paths: List[str], embedding: str = None) -> str:
+    return f"{sources_version(source_paths)}:{embedding or 'no-embeddings'}"
+
+
+def build_case_store(source_paths: List[str], directory: str, embeddings=None, batch_size: int = 64,
+                     embedding_model: str = None):
+    """Compile case records into the on-disk layout read by ``CaseLawStore``.
+
+    ``records.bin`` holds one JSON record per case addressed by ``offsets.npy``;
+    ``patterns.json`` maps matcher patterns and article IDs to case numbers;
+    ``headnotes.npy`` holds unit-normalised headnote embeddings when
+    ``embeddings`` is given, identified by ``embedding_model``. The files
+    are written to a new version directory and published atomically, so
+    open stores keep reading the previous one.
+    """
+    records = _dedupe(load_case_records(source_paths))
+    embedding = embedding_signature(embeddings, embedding_model)
+    staging = staging_dir(directory)
+
+    offsets = np.zeros(len(records) + 1, dtype=np.int64)
+    patterns, articles = {}, {}
+    with open(os.path.join(staging, "records.bin"), "wb") as f:
+        for i, record in enumerate(records):
+            offsets[i + 1] = offsets[i] + f.write(json.dumps(record, ensure_ascii=False).encode("utf8"))
+            for pattern, weight in _case_patterns(record).items():
+                patterns.setdefault(pattern, [weight, []])[1].append(i)
+            for article in record.get("articles") or []:
+                articles.setdefault(article.upper(), []).append(i)
+    np.save(os.path.join(staging, "offsets.npy"), offsets)
+
+    if embeddings is not None and records:
+        headnotes = [f"{r['name']}. {r.get('headnote', '')}" for r in records]
+        vectors = []
+        for start in range(0, len(headnotes), batch_size):
+            vectors.extend(embeddings.embed_documents(headnotes[start:start + batch_size]))
+        matrix = np.asarray(vectors, dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        np.save(os.path.join(staging, "headnotes.npy"), matrix)
+
+    with open(os.path.join(staging, "patterns.json"), "w", encoding="utf8") as f:
+        json.dump({
+            "version": store_version(source_paths, embedding),
+            "embedding": embedding,
+            "patterns": patterns,
+            "articles": articles,
+        }, f)
+    publish(directory, staging)
+    logger.info(f"Built case-law store: {len(records)} cases, {len(patterns)} patterns in {directory}")
+
+
+class CaseLawStore:
+    """Memory-mapped case-law corpus with multi-pattern and headnote-vector lookup.
+
+    Records stay on disk and are decoded only for the cases returned, so
+    memory use is dominated by the pattern automaton rather than the corpus.
+    """
+
+    def __init__(self, directory: str, embeddings=None):
+        self.embeddings = embeddings
+        directory = current_dir(directory)
+        with open(os.path.join(directory, "patterns.json"), "r", encoding="utf8") as f:
+            meta = json.load(f)
+        self.version = meta["version"]
+        self.embedding = meta.get("embedding")
+        self.articles = meta["articles"]
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+
+        self._file = open(os.path.join(directory, "records.bin"), "rb")
+        self._records = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if len(self.offsets) > 1 else b""
+        )
+
+        headnotes_path = os.path.join(directory, "headnotes.npy")
+        self.headnotes = np.load(headnotes_path, mmap_mode="r") if os.path.exists(headnotes_path) else None
+
+        self.automaton = _new_automaton()
+        for pattern, (weight, cases) in meta["patterns"].items():
+            self.automaton.add_word(pattern, (weight, cases))
+        self.automaton.make_automaton()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def record(self, i: int) -> dict:
+        return json.loads(self._records[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+    def lexical_scores(self, query: str) -> Dict[int, float]:
+        """Case number -> score from name, alias, citation and article-reference matches."""
+        scores = {}
+        for _, (weight, cases) in self.automaton.iter(normalize_text(query)):
+            for case in cases:
+                scores[case] = max(scores.get(case, 0.0), weight)
+        for article in extract_article_refs(query):
+            cases = self.articles.get(article, [])
+            for case in cases:
+                # Rarely cited articles say more about a case than Article 21 does
+                scores[case] = scores.get(case, 0.0) + ARTICLE_WEIGHT / (1 + np.log1p(len(cases)))
+        return scores
+
+    def vector_scores(self, query_vector, min_similarity: float, k: int) -> Dict[int, float]:
+        if self.headnotes is None or not len(self):
+            return {}
+        q = np.asarray(query_vector, dtype=np.float32)
+        similarities = self.headnotes @ (q / max(float(np.linalg.norm(q)), 1e-12))
+        k = min(k, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        return {int(i): float(similarities[i]) for i in top if similarities[i] >= min_similarity}
+
+    async def arank(self, query: str, k: int = 5, min_similarity: float = 0.5) -> List[Tuple[int, float]]:
+        """Ranked ``(case number, score)`` pairs for ``query``.
+
+        Exact matches rank first; headnote similarity orders ties and adds
+        cases the query describes without naming.
+        """
+        scores = self.lexical_scores(query)
+        if self.headnotes is not None and self.embeddings is not None:
+            vector = await self.embeddings.aembed_query(query)
+            for case, similarity in self.vector_scores(vector, min_similarity, k * 4).items():
+                scores[case] = scores.get(case, 0.0) + similarity
+        ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [(int(i), float(scores[i])) for i in ranked]
+
+    async def asearch(self, query: str, k: int = 5, min_similarity: float = 0.5) -> List[dict]:
+        """Ranked, de-duplicated case records for ``query``."""
+        return [self.record(i) for i, _ in await self.arank(query, k, min_similarity)]
+
+
+def format_case(record: dict) -> str:
+    citation = f" {record['citations'][0]}" if record.get("citations") else ""
+    return f"{record['name']} ({record.get('year', 'n.d.')}){citation} - {record.get('headnote', '')}"
+
+
+def case_source_files(data_dir: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(data_dir, "*.jsonl")) + glob.glob(os.path.join(data_dir, "*.parquet")))
+
+
+def ensure_case_store(data_dir: str, directory: str, embeddings=None, embedding_model: str = None):
+    """Open the compiled store, rebuilding it first if the source files or the embedding model changed."""
+    sources = case_source_files(data_dir)
+    if not sources:
+        logger.warning(f"No case-law sources found in {data_dir}")
+        return None
+    meta_path = os.path.join(current_dir(directory), "patterns.json")
+    current = None
+    if os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf8") as f:
+            current = json.load(f).get("version")
+    if current != store_version(sources, embedding_signature(embeddings, embedding_model)):
+        build_case_store(sources, directory, embeddings, embedding_model=embedding_model)
+    return CaseLawStore(directory, embeddings)
+
+
+def load_case_store(directory: str, embeddings=None, embedding_model: str = None):
+    """Open the published store read-only, without rebuilding it; ``None`` when there is none.
+
+    Headnote vectors from another embedding model are not used; lookups fall
+    back to name, citation and article matches until the store is rebuilt.
+    """
+    if not os.path.exists(os.path.join(current_dir(directory), "patterns.json")):
+        logger.warning(f"No case-law store in {directory}; run prepare_indexes() first")
+        return None
+    store = CaseLawStore(directory, embeddings)
+    embedding = embedding_signature(embeddings, embedding_model)
+    if embeddings is not None and store.embedding != embedding:
+        logger.warning(
+            f"Case-law headnotes were embedded with {store.embedding}, not {embedding}; "
+            f"headnote search disabled until prepare_indexes() runs"
+        )
+        store.embeddings = None
+    return store
+
+
+if __name__ == "__main__":
+    from config import get_embeddings, CASE_LAW_DATA_DIR, CASE_LAW_STORE_DIR, EMBED_BATCH_SIZE, EMBEDDING_MODEL
+
+    build_case_store(
+        case_source_files(CASE_LAW_DATA_DIR), CASE_LAW_STORE_DIR, get_embeddings(), EMBED_BATCH_SIZE, EMBEDDING_MODEL
+    )
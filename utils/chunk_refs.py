@@ -0,0 +1,70 @@
+import asyncio
+from typing import List, Optional
+from langchain_core.runnables import RunnableConfig
+from logger_util import setup_logger
+from utils.amendment_timeline import format_event
+from utils.case_law_store import format_case
+
+logger = setup_logger(__name__)
+
+# What a reference's ``id`` points into:
+#   "article" - article/clause/schedule ID in the ArticleIndex
+#   "chunk"   - chunk ID in the vector store
+#   "case"    - record number in the CaseLawStore
+#   "event"   - position in the AmendmentTimeline
+KINDS = ("article", "chunk", "case", "event")
+
+
+def make_ref(kind: str, ref_id, score: Optional[float] = None, span=None) -> dict:
+    """A compact, checkpointable pointer to retrieved context.
+
+    ``span`` is an optional ``[start, end]`` character range of the referenced
+    text; ``None`` stands for the whole text.
+    """
+    return {"kind": kind, "id": ref_id, "score": score, "span": span}
+
+
+def runtime_from_config(config: RunnableConfig):
+    """The shared ``Runtime`` passed to graph nodes through ``config["configurable"]["runtime"]``."""
+    return ((config or {}).get("configurable") or {}).get("runtime")
+
+
+def _slice(text: str, span) -> str:
+    return text[span[0]:span[1]] if span else text
+
+
+def hydrate(refs: List[dict], runtime) -> List[str]:
+    """Resolve references to their text, in order; references that no longer resolve are skipped.
+
+    Chunk texts are fetched from the vector store in one batched ``get``.
+    """
+    chunk_ids = [ref["id"] for ref in refs if ref["kind"] == "chunk"]
+    chunks = {}
+    if chunk_ids:
+        stored = runtime.vectorstore.get(ids=chunk_ids, include=["documents"])
+        chunks = dict(zip(stored["ids"], stored["documents"]))
+
+    texts = []
+    for ref in refs:
+        kind, ref_id = ref["kind"], ref["id"]
+        if kind == "article":
+            unit = runtime.article_index.lookup(ref_id)
+            text = f"[Article {ref_id}] {unit['text']}" if unit else None
+        elif kind == "chunk":
+            text = chunks.get(ref_id)
+        elif kind == "case":
+            text = format_case(runtime.case_store.record(ref_id))
+        elif kind == "event":
+            text = format_event(runtime.timeline.events[ref_id])
+        else:
+            text = None
+        if text is None:
+            logger.warning(f"Could not hydrate {kind} reference {ref_id!r}")
+            continue
+        texts.append(_slice(text, ref.get("span")))
+    return texts
+
+
+async def ahydrate(refs: List[dict], runtime) -> List[str]:
+    """``hydrate`` on a worker thread, since the vector store ``get`` blocks (Chroma is synchronous)."""
+    return await asyncio.to_thread(hydrate, refs, runtime)
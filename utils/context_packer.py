@@ -0,0 +1,133 @@
+import re
+import threading
+import zlib
+from typing import Dict, List
+import numpy as np
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+# Shortest suffix/prefix overlap treated as the splitter's chunk overlap
+MIN_OVERLAP_CHARS = 40
+NUM_PERMUTATIONS = 64
+SHINGLE_WORDS = 3
+_MERSENNE_PRIME = (1 << 61) - 1
+
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERMUTATIONS).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERMUTATIONS).astype(np.uint64)
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """tiktoken's cl100k_base (close to Llama 3's BPE), or False when unavailable offline."""
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    logger.warning(f"tiktoken unavailable ({e}); estimating tokens as characters / 4")
+                    _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoding = _get_encoding()
+    if encoding:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+def _merge_pair(first: str, second: str):
+    """``first`` extended by ``second`` if one ends where the other begins (or contains it), else None."""
+    if second in first:
+        return first
+    probe = second[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return None
+    start = first.find(probe)
+    while start != -1:
+        if second.startswith(first[start:]):
+            return first[:start] + second
+        start = first.find(probe, start + 1)
+    return None
+
+
+def merge_overlapping(texts: List[str]) -> List[str]:
+    """Stitch chunks that overlap (as adjacent splitter chunks do) into contiguous spans.
+
+    A merged span keeps the position of its highest-ranked chunk.
+    """
+    spans = list(texts)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(spans)):
+            for j in range(len(spans)):
+                if i == j:
+                    continue
+                combined = _merge_pair(spans[i], spans[j])
+                if combined is not None:
+                    spans[min(i, j)] = combined
+                    del spans[max(i, j)]
+                    merged = True
+                    break
+            if merged:
+                break
+    return spans
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    words = re.findall(r"\w+", text.lower())
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    hashes = np.array([zlib.crc32(s.encode("utf8")) for s in shingles], dtype=np.uint64)
+    return ((np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME).min(axis=0)
+
+
+def drop_near_duplicates(items: List[tuple], threshold: float) -> List[tuple]:
+    """Drop ``(section, text)`` items whose estimated Jaccard similarity to an earlier item reaches ``threshold``."""
+    kept, signatures = [], []
+    for item in items:
+        signature = minhash_signature(item[1])
+        if any(float(np.mean(signature == other)) >= threshold for other in signatures):
+            continue
+        kept.append(item)
+        signatures.append(signature)
+    return kept
+
+
+def pack_context(sections: Dict[str, List[str]], budget: int, dedup_threshold: float = 0.8) -> Dict[str, List[str]]:
+    """Merge, de-duplicate and fit each section's ranked snippets into ``budget`` tokens.
+
+    Snippets are taken round-robin by rank across sections, so the best item
+    of every section is kept before the second-best of any. A snippet that
+    does not fit is truncated only when it would be the first in its section.
+    """
+    merged = {name: merge_overlapping([t for t in texts if t and t.strip()]) for name, texts in sections.items()}
+    depth = max((len(texts) for texts in merged.values()), default=0)
+    ranked = [(name, texts[rank]) for rank in range(depth) for name, texts in merged.items() if rank < len(texts)]
+    ranked = drop_near_duplicates(ranked, dedup_threshold)
+
+    packed = {name: [] for name in sections}
+    remaining = budget
+    for name, text in ranked:
+        tokens = count_tokens(text)
+        if tokens <= remaining:
+            packed[name].append(text)
+            remaining -= tokens
+        elif not packed[name] and remaining > 64:
+            packed[name].append(truncate_to_tokens(text, remaining))
+            remaining = 0
+    return packed
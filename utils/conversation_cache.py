@@ -0,0 +1,100 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from logger_util import setup_logger
+from utils.lexical_index import tokenize
+from utils.references import extract_article_refs
+
+logger = setup_logger(__name__)
+
+# Openings that continue the previous turn, and pronouns that point back to it
+_FOLLOW_UP_OPENING = re.compile(r"^\s*(and|also|what about|how about|what else|then)\b", re.IGNORECASE)
+_BACK_REFERENCE = re.compile(r"\b(it|its|this|that|these|those|they|them|their|same|above)\b", re.IGNORECASE)
+# Words that ask for more of the same rather than for new material
+_FILLER = frozenset(
+    "about also and any are but can could does else explain give how me more please say says simpler so tell "
+    "terms them then there these they those what when where who why words would you your above same their".split()
+)
+
+
+def new_terms(query: str) -> List[str]:
+    """Content terms of a follow-up, i.e. what it asks about beyond the previous turn."""
+    return [term for term in tokenize(query) if term not in _FILLER]
+
+
+class ConversationCache:
+    """Last retrieved chunk set of each session, for follow-up queries to reuse or extend.
+
+    A follow-up is a query that names no article of its own, is asked while
+    its session has a live entry, and either opens with a continuation
+    ("and what about its exceptions?") or points back with a pronoun and
+    brings no new terms ("tell me more about it"). A pronoun alone is not
+    enough: "What is federalism and how does it work?" stands on its own.
+    One that brings no new terms reuses the chunk set as is; otherwise the
+    chunk set is extended by a small dense search for the topic plus the
+    new terms. Sessions are evicted
+    least-recently-used by count or TTL, and everything is dropped when the
+    corpus version changes.
+    """
+
+    def __init__(self, max_sessions: int, ttl_seconds: float, max_chunks: int):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_chunks = max_chunks
+        self.corpus_version = None
+        self.counts = {"reused": 0, "extended": 0, "misses": 0}
+        # session ID -> (topic query, chunk references, stored at)
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ensure_version(self, corpus_version: str):
+        with self._lock:
+            if corpus_version != self.corpus_version:
+                if self.corpus_version is not None:
+                    logger.info("Corpus changed; invalidating conversation cache")
+                self._sessions.clear()
+                self.corpus_version = corpus_version
+
+    def last_turn(self, session_id) -> Optional[Tuple[str, List[dict]]]:
+        """``(topic, chunk references)`` of the session's last retrieval, if still live."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            topic, refs, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            return topic, refs
+
+    def follow_up_turn(self, session_id, query: str) -> Optional[Tuple[str, List[dict]]]:
+        """The last turn ``query`` follows up on, or ``None`` when it stands on its own."""
+        if session_id is None or extract_article_refs(query):
+            return None
+        if not _FOLLOW_UP_OPENING.search(query) and not (_BACK_REFERENCE.search(query) and not new_terms(query)):
+            return None
+        return self.last_turn(session_id)
+
+    def put(self, session_id, topic: str, refs: List[dict]):
+        with self._lock:
+            self._sessions[session_id] = (topic, refs[:self.max_chunks], time.monotonic())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def forget(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def record(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = sum(self.counts.values())
+            hits = self.counts["reused"] + self.counts["extended"]
+            return dict(self.counts, sessions=len(self._sessions), hit_rate=hits / total if total else 0.0)
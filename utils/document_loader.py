@@ -1,17 +1,80 @@
 import os
-from typing import List
-from langchain_community.document_loaders import PyPDFLoader
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List
+from langchain_core.documents import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-def load_and_split_pdfs(pdf_paths: List[str]):
-    documents = []
+# Pages extracted per worker task; small enough to keep workers balanced,
+# large enough to amortise re-opening the PDF in each task.
+PAGES_PER_TASK = 16
+
+
+def _page_count(path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def _extract_pages(path: str, start: int, stop: int):
+    """Worker: extract the text of pages ``[start, stop)`` of one PDF."""
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return [(number, reader.pages[number].extract_text().strip()) for number in range(start, stop)]
+
+
+def iter_pdf_pages(pdf_paths: List[str], workers: int = None) -> Iterator[Document]:
+    """Yield one Document per PDF page, in file and page order.
+
+    Page ranges are extracted in a process pool; at most ``2 * workers`` tasks
+    are in flight so memory stays bounded regardless of corpus size. Metadata
+    matches ``PyPDFLoader`` (``source``, ``page``, ``total_pages``).
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = []
     for path in pdf_paths:
         if not os.path.exists(path):
             print(f"Warning: File not found at {path}")
             continue
-        loader = PyPDFLoader(path)
-        documents.extend(loader.load())
+        total = _page_count(path)
+        tasks.extend((path, start, min(start + PAGES_PER_TASK, total), total) for start in range(0, total, PAGES_PER_TASK))
 
+    def to_documents(task, pages):
+        path, _, _, total = task
+        for number, text in pages:
+            yield Document(page_content=text, metadata={"source": path, "page": number, "total_pages": total})
+
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield from to_documents(task, _extract_pages(*task[:3]))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        next_task = 0
+        while next_task < len(tasks) or pending:
+            while next_task < len(tasks) and len(pending) < 2 * workers:
+                task = tasks[next_task]
+                pending.append((task, executor.submit(_extract_pages, *task[:3])))
+                next_task += 1
+            task, future = pending.pop(0)
+            yield from to_documents(task, future.result())
+
+
+def iter_pdf_chunks(pdf_paths: List[str], workers: int = None, stats: dict = None, on_page=None) -> Iterator[Document]:
+    """Stream split chunks page by page instead of materialising every page first.
+
+    ``stats``, if given, is updated in place with ``pages`` and ``chunks`` counts;
+    ``on_page``, if given, is called with each page Document before it is split.
+    """
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    split_docs = text_splitter.split_documents(documents)
-    return split_docs
+    for page in iter_pdf_pages(pdf_paths, workers=workers):
+        if on_page is not None:
+            on_page(page)
+        chunks = text_splitter.split_documents([page])
+        if stats is not None:
+            stats["pages"] = stats.get("pages", 0) + 1
+            stats["chunks"] = stats.get("chunks", 0) + len(chunks)
+        yield from chunks
+
+
+def load_and_split_pdfs(pdf_paths: List[str]):
+    return list(iter_pdf_chunks(pdf_paths))
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from logger_util import setup_logger
+from utils.metrics import cache_lookups
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialised within the process
+    fcntl = None
+
+logger = setup_logger(__name__)
+
+KEY_BYTES = 16
+
+
+class EmbeddingStore:
+    """Append-only on-disk table of float32 vectors addressed by 16-byte keys.
+
+    ``keys.bin`` holds the keys in row order and ``vectors.f32`` the matching
+    rows, read back through a memory map so the cache costs page cache rather
+    than heap. Vectors are written before their keys, so a crash mid-append can
+    only leave unreferenced trailing bytes, which are ignored on load and cut
+    off by the next append.
+
+    Several processes (e.g. server workers) may share a directory: appends
+    hold an exclusive ``flock`` and take their row numbers from the file
+    sizes, and keys appended by other processes are indexed before a lookup
+    is reported as a miss.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.keys_path = os.path.join(directory, "keys.bin")
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.lock_path = os.path.join(directory, "append.lock")
+        self.dim = None
+        self.index = {}
+        # Complete rows present on disk when the index was last refreshed
+        self.rows = 0
+        self._matrix = None
+        self._lock = threading.Lock()
+        self._refresh()
+        if self.rows:
+            logger.info("Loaded embedding cache with %d vectors from %s", self.rows, self.directory)
+
+    def _disk_rows(self) -> int:
+        """Rows complete in both files: a key is only written after its vector."""
+        keys = os.path.getsize(self.keys_path) if os.path.exists(self.keys_path) else 0
+        vectors = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        return min(keys // KEY_BYTES, vectors // (4 * self.dim))
+
+    def _refresh(self):
+        """Index rows appended since the last refresh, by this or another process."""
+        if self.dim is None:
+            if not os.path.exists(self.meta_path):
+                return
+            with open(self.meta_path, "r", encoding="utf8") as f:
+                self.dim = json.load(f)["dim"]
+        rows = self._disk_rows()
+        if rows <= self.rows:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self.rows * KEY_BYTES)
+            keys = f.read((rows - self.rows) * KEY_BYTES)
+        for i in range(rows - self.rows):
+            self.index.setdefault(keys[i * KEY_BYTES:(i + 1) * KEY_BYTES], self.rows + i)
+        self.rows = rows
+
+    def _rows(self):
+        """Memory-mapped view covering every row currently indexed."""
+        if self._matrix is None or self._matrix.shape[0] < self.rows:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+        return self._matrix
+
+    def get_many(self, keys: List[bytes]):
+        """Return a list with the cached vector for each key, or None on a miss."""
+        with self._lock:
+            rows = [self.index.get(key) for key in keys]
+            if any(row is None for row in rows):
+                self._refresh()
+                rows = [self.index.get(key) for key in keys]
+            if not any(row is not None for row in rows):
+                return [None] * len(keys)
+            matrix = self._rows()
+            return [None if row is None else matrix[row].tolist() for row in rows]
+
+    def put_many(self, keys: List[bytes], vectors: List[List[float]]):
+        if not keys:
+            return
+        array = np.asarray(vectors, dtype=np.float32)
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if self.dim is None and not os.path.exists(self.meta_path):
+                with open(self.meta_path, "w", encoding="utf8") as f:
+                    json.dump({"dim": int(array.shape[1])}, f)
+            self._refresh()
+            fresh = list({key: i for i, key in enumerate(keys) if key not in self.index}.values())
+            if not fresh:
+                return
+            # Row numbers come from the files, not from this process's view of them
+            start = self._disk_rows()
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(start * 4 * self.dim)
+                f.write(array[fresh].tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.truncate(start * KEY_BYTES)
+                f.write(b"".join(keys[i] for i in fresh))
+            for offset, i in enumerate(fresh):
+                self.index[keys[i]] = start + offset
+            self.rows = start + len(fresh)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that consults a cache before running the model.
+
+    Document embeddings are keyed by (model name, normalisation flag, text
+    hash): each model/flag pair gets its own ``EmbeddingStore`` under
+    ``cache_dir`` and rows within it are addressed by a hash of the text, so
+    store rebuilds and re-chunking experiments only run the model for texts it
+    has never seen. Query embeddings come from an open-ended stream of user
+    input and would grow the append-only store without bound, so they are
+    kept in an in-memory LRU of ``query_cache_size`` entries instead.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, normalize: bool, cache_dir: str,
+                 query_cache_size: int = 1024):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.normalize = normalize
+        namespace = re.sub(r"[^A-Za-z0-9_.-]", "__", model_name) + ("-normalized" if normalize else "")
+        self.store = EmbeddingStore(os.path.join(cache_dir, namespace))
+        self.query_cache_size = query_cache_size
+        self._queries = OrderedDict()
+        self._queries_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(kind: str, text: str) -> bytes:
+        # Queries and documents are namespaced apart since some models embed them differently.
+        return hashlib.blake2b(f"{kind}\0{text}".encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("doc", text) for text in texts]
+        vectors = self.store.get_many(keys)
+
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+            else:
+                self.hits += 1
+        self.misses += len(missing)
+
+        if missing:
+            # Round through float32 so fresh and cached results are identical.
+            computed = np.asarray(self.underlying.embed_documents(list(missing.values())), dtype=np.float32).tolist()
+            self.store.put_many(list(missing), computed)
+            by_key = dict(zip(missing, computed))
+            vectors = [by_key[keys[i]] if vector is None else vector for i, vector in enumerate(vectors)]
+
+        logger.debug("Embedding cache: %d texts, %d computed", len(texts), len(missing))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        with self._queries_lock:
+            cached = self._queries.get(key)
+            if cached is not None:
+                self._queries.move_to_end(key)
+        if cached is not None:
+            self.hits += 1
+            cache_lookups.inc(cache="embedding", result="hit")
+            return cached
+        self.misses += 1
+        cache_lookups.inc(cache="embedding", result="miss")
+        vector = np.asarray(self.underlying.embed_query(text), dtype=np.float32).tolist()
+        with self._queries_lock:
+            self._queries[key] = vector
+            while len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+        return vector
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+            "cached_queries": len(self._queries),
+        }
@@ -0,0 +1,67 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Tuple
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+# Runs BM25 alongside the dense search on the synchronous path.
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="bm25")
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], rrf_k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists into ``(id, score)`` pairs; each appearance at rank r contributes 1 / (rrf_k + r)."""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense + BM25 retriever fused with reciprocal-rank fusion.
+
+    Both searches fetch ``fetch_k`` candidates concurrently; the fused top
+    ``k`` are returned as Documents, with the fused score in
+    ``metadata["score"]``. Chunks found only lexically are loaded from the
+    vector store by ID.
+    """
+
+    vectorstore: Any
+    lexical_index: Any
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+
+    def _fuse(self, dense_docs: List[Document], lexical_hits) -> List[Document]:
+        by_id = {doc.metadata.get("chunk_id", doc.id): doc for doc in dense_docs}
+        fused = reciprocal_rank_fusion(
+            [list(by_id), [chunk_id for chunk_id, _ in lexical_hits]], self.rrf_k
+        )[:self.k]
+
+        missing = [chunk_id for chunk_id, _ in fused if chunk_id not in by_id]
+        if missing:
+            stored = self.vectorstore.get(ids=missing, include=["documents", "metadatas"])
+            for chunk_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                by_id[chunk_id] = Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+
+        logger.debug(f"Hybrid retrieval: {len(fused)} fused, {len(missing)} lexical-only")
+        return [
+            Document(page_content=by_id[chunk_id].page_content, metadata=dict(by_id[chunk_id].metadata, score=score),
+                     id=chunk_id)
+            for chunk_id, score in fused if chunk_id in by_id
+        ]
+
+    def _get_relevant_documents(self, query: str, *, run_manager, **kwargs) -> List[Document]:
+        lexical = _executor.submit(self.lexical_index.search, query, self.fetch_k)
+        dense_docs = self.vectorstore.similarity_search(query, k=self.fetch_k)
+        return self._fuse(dense_docs, lexical.result())
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager, **kwargs) -> List[Document]:
+        dense_docs, lexical_hits = await asyncio.gather(
+            self.vectorstore.asimilarity_search(query, k=self.fetch_k),
+            asyncio.to_thread(self.lexical_index.search, query, self.fetch_k),
+        )
+        return await asyncio.to_thread(self._fuse, dense_docs, lexical_hits)
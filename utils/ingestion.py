@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List
+from config import INGEST_WORKERS, EMBED_BATCH_SIZE
+from logger_util import setup_logger
+from utils.document_loader import iter_pdf_chunks
+from utils.article_index import ArticleParser, attach_chunk_ids
+
+logger = setup_logger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path: str) -> str:
+    """Content hash of a source file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def assign_chunk_ids(source: str, docs, seen: dict = None) -> Dict[str, str]:
+    """Give each chunk a stable ID derived from its source and text.
+
+    IDs depend only on the chunk's own content (plus an occurrence counter for
+    identical chunks within one file), so an edit elsewhere in the file does not
+    change them. The ID is also stored in ``metadata["chunk_id"]``. Pass the
+    same ``seen`` dict when a file's chunks arrive in several batches.
+    Returns a mapping of chunk ID to chunk text hash.
+    """
+    chunks = {}
+    seen = {} if seen is None else seen
+    for doc in docs:
+        text_hash = text_sha256(doc.page_content)
+        occurrence = seen.get(text_hash, 0)
+        seen[text_hash] = occurrence + 1
+        chunk_id = hashlib.sha256(f"{source}\0{occurrence}\0{text_hash}".encode("utf-8")).hexdigest()[:32]
+        doc.metadata["chunk_id"] = chunk_id
+        chunks[chunk_id] = text_hash
+    return chunks
+
+
+def corpus_version(files: Dict[str, dict]) -> str:
+    """Hash of every indexed file's content hash; changes whenever the corpus does."""
+    digest = hashlib.sha256()
+    for source in sorted(files):
+        digest.update(f"{source}\0{files[source]['sha256']}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path: str) -> dict:
+    if not os.path.exists(manifest_path):
+        return {"version": MANIFEST_VERSION, "files": {}, "corpus_version": corpus_version({})}
+    with open(manifest_path, "r", encoding="utf8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict, manifest_path: str):
+    """Write the manifest atomically so an interrupted sync never leaves it half-written."""
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def _index_files(vectorstore, changed, files, article_index=None):
+    """Stream chunks of the changed files into the store in embedding batches.
+
+    Pages are parsed in parallel by ``iter_pdf_chunks`` and chunks are written
+    ``EMBED_BATCH_SIZE`` at a time, so memory is bounded by one batch rather
+    than the whole corpus. The same page stream feeds an ``ArticleParser`` per
+    file for ``article_index``. Updates ``files`` in place; returns (added, removed).
+    """
+    source_of = {path: source for source, path, _ in changed}
+    old_chunks = {source: (files.get(source) or {}).get("chunks", {}) for source, _, _ in changed}
+    new_chunks = {source: {} for source, _, _ in changed}
+    seen = {source: {} for source, _, _ in changed}
+    parsers = {source: ArticleParser() for source, _, _ in changed}
+    page_chunks = {source: {} for source, _, _ in changed}
+
+    stats = {}
+    batch = []
+    added = 0
+    start = time.perf_counter()
+
+    def flush():
+        nonlocal added
+        vectorstore.add_documents(batch, ids=[doc.metadata["chunk_id"] for doc in batch])
+        added += len(batch)
+        batch.clear()
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        logger.info(
+            "Ingested %d pages, %d chunks (%d embedded): %.1f pages/s, %.1f chunks/s",
+            stats.get("pages", 0), stats.get("chunks", 0), added,
+            stats.get("pages", 0) / elapsed, stats.get("chunks", 0) / elapsed,
+        )
+
+    def on_page(page):
+        parsers[source_of[page.metadata["source"]]].feed(page)
+
+    paths = [path for _, path, _ in changed]
+    for doc in iter_pdf_chunks(paths, workers=INGEST_WORKERS, stats=stats, on_page=on_page):
+        source = source_of[doc.metadata["source"]]
+        new_chunks[source].update(assign_chunk_ids(source, [doc], seen[source]))
+        page_chunks[source].setdefault(doc.metadata["page"], []).append(doc.metadata["chunk_id"])
+        if doc.metadata["chunk_id"] not in old_chunks[source]:
+            batch.append(doc)
+        if len(batch) >= EMBED_BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+
+    removed = 0
+    for source, _, sha in changed:
+        stale_ids = [cid for cid in old_chunks[source] if cid not in new_chunks[source]]
+        if stale_ids:
+            vectorstore.delete(ids=stale_ids)
+        removed += len(stale_ids)
+        files[source] = {"sha256": sha, "chunks": new_chunks[source]}
+        if article_index is not None:
+            article_index.set_file(source, attach_chunk_ids(parsers[source].close(), page_chunks[source]))
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    logger.info(
+        "Indexed %d files in %.2fs: %.1f pages/s, %.1f chunks/s",
+        len(changed), elapsed, stats.get("pages", 0) / elapsed, stats.get("chunks", 0) / elapsed,
+    )
+    return added, removed
+
+
+def sync_corpus(vectorstore, pdf_paths: List[str], manifest_path: str, article_index=None) -> dict:
+    """Bring ``vectorstore`` in line with ``pdf_paths`` using the ingestion manifest.
+
+    Unchanged files (same content hash) are skipped without parsing. Changed or
+    new files are re-parsed, and only chunks whose IDs are not already in the
+    store are embedded; chunks that disappeared from a file, or belong to a
+    file that was removed, are deleted. ``article_index``, if given, is kept in
+    step and saved; files it has not seen yet are re-parsed (but not re-embedded).
+    """
+    manifest = load_manifest(manifest_path)
+    files = manifest["files"]
+
+    if not files:
+        # A store built before the manifest existed has random chunk IDs we
+        # cannot reconcile, so start from a clean collection.
+        existing_ids = vectorstore.get(include=[])["ids"]
+        if existing_ids:
+            logger.info("No ingestion manifest found; clearing %d legacy chunks", len(existing_ids))
+            vectorstore.delete(ids=existing_ids)
+
+    sources = {}
+    for path in pdf_paths:
+        if not os.path.exists(path):
+            logger.warning("File not found at %s; skipping", path)
+            continue
+        sources[os.path.normpath(path)] = path
+
+    changed = []
+    for source, path in sources.items():
+        sha = file_sha256(path)
+        entry = files.get(source)
+        indexed = article_index is None or source in article_index.files
+        if entry and entry["sha256"] == sha and indexed:
+            continue
+        logger.info("Indexing %s file %s", "changed" if entry else "new", source)
+        changed.append((source, path, sha))
+
+    added, removed = _index_files(vectorstore, changed, files, article_index) if changed else (0, 0)
+
+    deleted = [s for s in files if s not in sources]
+    for source in deleted:
+        logger.info("Removing chunks of deleted file %s", source)
+        stale_ids = list(files.pop(source)["chunks"])
+        if stale_ids:
+            vectorstore.delete(ids=stale_ids)
+        removed += len(stale_ids)
+        if article_index is not None:
+            article_index.remove_file(source)
+
+    if article_index is not None and (changed or deleted):
+        article_index.save()
+
+    manifest["version"] = MANIFEST_VERSION
+    manifest["corpus_version"] = corpus_version(files)
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    save_manifest(manifest, manifest_path)
+    logger.info("Corpus sync complete: %d chunks added, %d removed, %d files indexed", added, removed, len(files))
+    return manifest
@@ -0,0 +1,122 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import List, Tuple
+import numpy as np
+from logger_util import setup_logger
+from utils.publish import current_dir, publish, staging_dir
+
+logger = setup_logger(__name__)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word/number tokens; numbers and roman numerals are kept as terms."""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class LexicalIndex:
+    """In-process BM25 inverted index over the vector store's chunks.
+
+    Stored as plain ``.npy`` arrays (postings, term frequencies, offsets and
+    document lengths) plus JSON term and chunk-ID lists, loaded with
+    ``mmap_mode="r"`` so opening the index is cheap and several processes
+    share the same pages. ``corpus_version`` ties the index to the manifest.
+    Each build is written to a new version directory and published
+    atomically, so processes mapping the previous index are not disturbed.
+    """
+
+    FILES = ("offsets", "postings", "frequencies", "doc_lengths")
+
+    def __init__(self, directory: str, terms, chunk_ids, arrays, corpus_version: str, k1=1.5, b=0.75):
+        self.directory = directory
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.chunk_ids = chunk_ids
+        self.offsets = arrays["offsets"]
+        self.postings = arrays["postings"]
+        self.frequencies = arrays["frequencies"]
+        self.doc_lengths = arrays["doc_lengths"]
+        self.corpus_version = corpus_version
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, directory: str, chunk_ids: List[str], texts: List[str], corpus_version: str):
+        postings = {}
+        doc_lengths = np.zeros(len(texts), dtype=np.int32)
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths[doc] = sum(counts.values())
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((doc, count))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(postings[term])
+        flat = [entry for term in terms for entry in postings[term]]
+        arrays = {
+            "offsets": offsets,
+            "postings": np.array([doc for doc, _ in flat], dtype=np.int32),
+            "frequencies": np.array([min(count, 65535) for _, count in flat], dtype=np.uint16),
+            "doc_lengths": doc_lengths,
+        }
+
+        staging = staging_dir(directory)
+        for name in cls.FILES:
+            np.save(os.path.join(staging, f"{name}.npy"), arrays[name])
+        with open(os.path.join(staging, "meta.json"), "w", encoding="utf8") as f:
+            json.dump({"corpus_version": corpus_version, "terms": terms, "chunk_ids": chunk_ids}, f)
+        publish(directory, staging)
+        logger.info(f"Built lexical index: {len(texts)} chunks, {len(terms)} terms, {len(flat)} postings")
+        return cls(directory, terms, chunk_ids, arrays, corpus_version)
+
+    @classmethod
+    def load(cls, directory: str):
+        version_dir = current_dir(directory)
+        meta_path = os.path.join(version_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf8") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode="r") for name in cls.FILES}
+        return cls(directory, meta["terms"], meta["chunk_ids"], arrays, meta["corpus_version"])
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-``k`` ``(chunk_id, bm25_score)`` pairs for ``query``."""
+        n_docs = len(self.chunk_ids)
+        if not n_docs:
+            return []
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.postings[start:end]
+            tf = self.frequencies[start:end].astype(np.float32)
+            idf = math.log(1 + (n_docs - (end - start) + 0.5) / ((end - start) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / self.avg_length)
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        k = min(k, n_docs)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.chunk_ids[i], float(scores[i])) for i in top if scores[i] > 0]
+
+
+def ensure_lexical_index(vectorstore, directory: str, corpus_version: str) -> LexicalIndex:
+    """Load the on-disk index, rebuilding it from the vector store if the corpus changed."""
+    index = LexicalIndex.load(directory)
+    if index is not None and index.corpus_version == corpus_version:
+        return index
+    logger.info("Lexical index missing or stale; rebuilding from the vector store")
+    stored = vectorstore.get(include=["documents"])
+    return LexicalIndex.build(directory, stored["ids"], stored["documents"], corpus_version)
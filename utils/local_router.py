@@ -0,0 +1,126 @@
+import asyncio
+import re
+import numpy as np
+from config import get_embeddings
+from graph_state import RouterOutput
+from logger_util import setup_logger
+from utils.references import extract_article_refs
+
+logger = setup_logger(__name__)
+
+FLAGS = ("route_to_article_search", "route_to_case_law", "route_to_historical_context")
+
+_CASE_PATTERN = re.compile(
+    r"\bvs?\.\s|\b(vs|versus|case law|cases|judg(e)?ments?|verdict|rulings?|precedents?|supreme court|high court|bench"
+    r"|puttaswamy|kesavananda|maneka|golaknath|minerva|indra sawhney|shah bano|navtej|vishaka|bommai)\b",
+    re.IGNORECASE,
+)
+_HISTORY_PATTERN = re.compile(
+    r"\b(amendment|amendments|amended|amend|history|historical|originally|abrogat\w*|repeal\w*|inserted|omitted"
+    r"|substituted|constituent assembly|emergency|since|changed|evolution|(19[4-9]\d|20[0-2]\d))\b",
+    re.IGNORECASE,
+)
+_ARTICLE_TOPIC_PATTERN = re.compile(
+    r"\b(fundamental rights?|directive principles?|fundamental duties|schedule|part [ivx]+|clause|provision|preamble)\b",
+    re.IGNORECASE,
+)
+
+# Labelled example queries for the similarity tier: (query, article_search, case_law, historical_context)
+LABELLED_EXAMPLES = [
+    ("What does the Constitution say about equality before law?", True, False, False),
+    ("Explain the fundamental rights guaranteed to citizens", True, False, False),
+    ("What are the directive principles of state policy?", True, False, False),
+    ("Which languages are listed in the Eighth Schedule?", True, False, False),
+    ("What are the fundamental duties of citizens?", True, False, False),
+    ("How is the President of India elected?", True, False, False),
+    ("What powers does the Governor have?", True, False, False),
+    ("Can the State make special provisions for women and children?", True, False, False),
+    ("What protection exists against arrest and detention?", True, False, False),
+    ("How are disputes between states and the Union resolved?", True, False, False),
+    ("Is privacy a fundamental right?", True, True, False),
+    ("Cases related to freedom of speech", False, True, False),
+    ("Which judgments shaped the basic structure doctrine?", False, True, True),
+    ("What did the Supreme Court decide about reservation in promotions?", True, True, False),
+    ("Landmark rulings on the right to life and personal liberty", True, True, False),
+    ("Has the court struck down any constitutional amendment?", False, True, True),
+    ("Tell me about the right to privacy", True, True, False),
+    ("What happened to Article 370?", True, False, True),
+    ("Why was the right to property removed from fundamental rights?", True, False, True),
+    ("How did the Emergency change the Constitution?", False, False, True),
+    ("When was the word socialist added to the Preamble?", True, False, True),
+    ("History of anti-defection law", True, False, True),
+    ("When did voting age become 18?", True, False, True),
+    ("What was the original text of the Constitution on free speech?", True, False, True),
+    ("How has the Constitution evolved over time?", False, False, True),
+    ("Hello, what can you do?", False, False, False),
+    ("Thanks for the help", False, False, False),
+]
+
+
+class LocalRouter:
+    """First routing tier that avoids the LLM for obvious queries.
+
+    Keyword/regex rules catch explicit article references, case names and
+    amendment vocabulary. Queries no rule fires on are scored by a k-nearest
+    neighbour vote against ``LABELLED_EXAMPLES`` using the shared embedder.
+    ``aclassify`` returns the decision and a confidence in [0, 1]; callers fall
+    back to the LLM router when the confidence is below their threshold.
+    """
+
+    def __init__(self, examples=LABELLED_EXAMPLES, k=5):
+        self.examples = examples
+        self.k = min(k, len(examples))
+        self._labels = np.array([example[1:] for example in examples], dtype=np.float32)
+        self._matrix = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def rule_flags(query: str):
+        """Flags set by the explicit keyword rules, or None when none applies.
+
+        Generic topic words ("fundamental rights", "schedule") only add article
+        search on top of an explicit match; on their own they are too vague to
+        rule out case law or history, so such queries go to the similarity tier.
+        """
+        flags = {
+            "route_to_article_search": bool(extract_article_refs(query)),
+            "route_to_case_law": bool(_CASE_PATTERN.search(query)),
+            "route_to_historical_context": bool(_HISTORY_PATTERN.search(query)),
+        }
+        if not any(flags.values()):
+            return None
+        flags["route_to_article_search"] |= bool(_ARTICLE_TOPIC_PATTERN.search(query))
+        return flags
+
+    async def _example_matrix(self):
+        async with self._lock:
+            if self._matrix is None:
+                vectors = await get_embeddings().aembed_documents([example[0] for example in self.examples])
+                matrix = np.asarray(vectors, dtype=np.float32)
+                self._matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+            return self._matrix
+
+    async def aclassify(self, query: str):
+        flags = self.rule_flags(query)
+        if flags is not None:
+            matched = ", ".join(flag[len("route_to_"):] for flag, on in flags.items() if on)
+            return RouterOutput(**flags, reasoning=f"Local rules matched: {matched}"), 0.9
+
+        matrix = await self._example_matrix()
+        vector = np.asarray(await get_embeddings().aembed_query(query), dtype=np.float32)
+        similarities = matrix @ (vector / (np.linalg.norm(vector) or 1.0))
+        nearest = np.argsort(-similarities)[:self.k]
+        weights = np.clip(similarities[nearest], 0.0, None)
+        if not weights.sum():
+            return None, 0.0
+
+        probabilities = weights @ self._labels[nearest] / weights.sum()
+        flags = {flag: bool(p >= 0.5) for flag, p in zip(FLAGS, probabilities)}
+        # Confidence is limited by the least decisive flag and by how close the
+        # nearest labelled example actually is.
+        confidence = float(np.min(np.abs(probabilities - 0.5) * 2) * similarities[nearest[0]])
+        reasoning = f"Nearest labelled example: {self.examples[nearest[0]][0]!r}"
+        return RouterOutput(**flags, reasoning=reasoning), confidence
+
+
+local_router = LocalRouter()
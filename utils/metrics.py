@@ -0,0 +1,183 @@
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Tuple
+from uuid import UUID
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.runnables import RunnableConfig
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds: sub-millisecond lookups up to slow LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+
+def _label_text(labelnames, labelvalues, extra=None) -> str:
+    pairs = list(zip(labelnames, labelvalues)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Monotonic counter with labels, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket counts (+Inf last), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, ('le', le))} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {count}")
+        return lines
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+request_duration = Histogram(
+    "btp_request_duration_seconds", "End-to-end query latency.", ["outcome"]
+)
+stage_duration = Histogram(
+    "btp_stage_duration_seconds", "Latency of graph nodes, retriever and LLM calls and cache lookups.", ["stage"]
+)
+llm_tokens = Counter("btp_llm_tokens_total", "LLM tokens by direction.", ["kind"])
+cache_lookups = Counter("btp_cache_lookups_total", "Cache lookups by cache and result.", ["cache", "result"])
+
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block into ``btp_stage_duration_seconds{stage=...}``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration.observe(elapsed, stage=stage)
+        logger.debug("span %s took %.1fms", stage, elapsed * 1000)
+
+
+def timed_node(agent, stage: str = None):
+    """Wrap an async graph node in a span named after it.
+
+    The ``config`` argument is forwarded only to nodes that declare it, so
+    LangGraph keeps passing the run config to nodes such as the synthesizer.
+    """
+    stage = stage or f"node:{agent.__name__}"
+    takes_config = "config" in inspect.signature(agent).parameters
+
+    @functools.wraps(agent)
+    async def wrapper(state, config: RunnableConfig = None):
+        with span(stage):
+            if takes_config:
+                return await agent(state, config=config)
+            return await agent(state)
+
+    return wrapper
+
+
+class MetricsCallbackHandler(AsyncCallbackHandler):
+    """Records retriever and LLM call latency and LLM token usage for one query."""
+
+    run_inline = True
+
+    def __init__(self):
+        self._starts: Dict[UUID, Tuple[str, float]] = {}
+
+    def _start(self, run_id: UUID, kind: str, metadata):
+        # Label by the graph node making the call, e.g. "llm:router"
+        node = (metadata or {}).get("langgraph_node")
+        self._starts[run_id] = (f"{kind}:{node}" if node else kind, time.perf_counter())
+
+    def _finish(self, run_id: UUID):
+        stage, start = self._starts.pop(run_id, (None, None))
+        if stage is not None:
+            stage_duration.observe(time.perf_counter() - start, stage=stage)
+
+    async def on_retriever_start(self, serialized, query, *, run_id: UUID, metadata=None, **kwargs):
+        self._start(run_id, "retriever", metadata)
+
+    async def on_retriever_end(self, documents, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
+
+    async def on_retriever_error(self, error, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs):
+        self._start(run_id, "llm", metadata)
+
+    async def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if not usage and response.generations and response.generations[0]:
+            # Streamed responses report usage on the message instead
+            metadata = getattr(getattr(response.generations[0][0], "message", None), "usage_metadata", None) or {}
+            usage = {"prompt_tokens": metadata.get("input_tokens"), "completion_tokens": metadata.get("output_tokens")}
+        for kind in ("prompt", "completion"):
+            if usage.get(f"{kind}_tokens"):
+                llm_tokens.inc(usage[f"{kind}_tokens"], kind=kind)
+
+    async def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
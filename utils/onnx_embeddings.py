@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import time
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+MODEL_FILE = "model.onnx"
+INT8_MODEL_FILE = "model_int8.onnx"
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings from an exported ONNX transformer (``EMBEDDINGS_BACKEND=onnx``).
+
+    Reproduces the all-MiniLM-L6-v2 sentence-transformers pipeline (mean
+    pooling over the attention mask, then L2 normalisation) with onnxruntime
+    and a Rust ``tokenizers`` tokenizer, so neither torch nor transformers is
+    imported at serve time. Documents are sorted by length before batching so
+    each batch pads to similar lengths. ``model_dir`` is produced by
+    ``python -m utils.onnx_embeddings export``; ``quantized`` selects the
+    dynamically int8-quantised copy written by ``export --int8``.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, batch_size: int = 32, threads: int = 0,
+                 max_seq_length: int = 256):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        model_path = os.path.join(model_dir, INT8_MODEL_FILE if quantized else MODEL_FILE)
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        pad_id = self.tokenizer.token_to_id("[PAD]")
+        self.tokenizer.enable_padding(pad_id=pad_id or 0, pad_token="[PAD]")
+        logger.info(f"Loaded ONNX embeddings from {model_path} (batch {batch_size}, max length {max_seq_length})")
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: feeds[name] for name in self.input_names})[0]
+        weights = mask[:, :, None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.where(norms == 0, 1.0, norms)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0].tolist()
+
+
+def export_model(model_name: str, output_dir: str, int8: bool = False, opset: int = 14):
+    """Export ``model_name`` and its tokenizer to ``output_dir``, optionally with an int8 copy.
+
+    Needs torch and transformers (already installed for the HuggingFace
+    backend) plus onnx; only this export step uses them.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(output_dir)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    sample = tokenizer(["Export sample sentence."], return_tensors="pt")
+    names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    axes = {name: {0: "batch", 1: "sequence"} for name in names}
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in names), model_path,
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes=dict(axes, last_hidden_state={0: "batch", 1: "sequence"}),
+            opset_version=opset,
+        )
+    logger.info(f"Exported {model_name} to {model_path}")
+
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(model_path, os.path.join(output_dir, INT8_MODEL_FILE), weight_type=QuantType.QInt8)
+        logger.info(f"Wrote dynamically int8-quantised model to {os.path.join(output_dir, INT8_MODEL_FILE)}")
+
+
+def _sample_texts(limit: int = 200) -> List[str]:
+    """Benchmark queries plus case-law headnotes: short query-like and longer passage-like texts."""
+    texts = []
+    for path in ("benchmarks/queries.jsonl", "data/case_law/landmark_judgments.jsonl"):
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        texts.append(record.get("query") or record.get("headnote"))
+    return [text for text in texts if text][:limit]
+
+
+def _timed(embeddings: Embeddings, texts: List[str]):
+    embeddings.embed_query("warm-up")
+    start = time.perf_counter()
+    for text in texts[:50]:
+        embeddings.embed_query(text)
+    query_ms = (time.perf_counter() - start) / min(len(texts), 50) * 1000
+    start = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    docs_per_s = len(texts) / (time.perf_counter() - start)
+    return vectors, query_ms, docs_per_s
+
+
+def check_agreement(reference: Embeddings, candidate: Embeddings, texts: List[str]) -> dict:
+    """Cosine agreement of ``candidate`` with ``reference`` on ``texts``, plus latency and throughput of both."""
+    expected, reference_query_ms, reference_docs_per_s = _timed(reference, texts)
+    actual, query_ms, docs_per_s = _timed(candidate, texts)
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    actual /= np.linalg.norm(actual, axis=1, keepdims=True)
+    cosines = (expected * actual).sum(axis=1)
+    return {
+        "texts": len(texts),
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "min_cosine": round(float(cosines.min()), 5),
+        "reference_query_ms": round(reference_query_ms, 3),
+        "query_ms": round(query_ms, 3),
+        "reference_docs_per_s": round(reference_docs_per_s, 1),
+        "docs_per_s": round(docs_per_s, 1),
+    }
+
+
+if __name__ == "__main__":
+    from config import (
+        HF_EMBEDDING_MODEL, ONNX_MODEL_DIR, ONNX_INT8, EMBEDDING_BATCH_SIZE, ONNX_THREADS, ONNX_MAX_SEQ_LENGTH,
+    )
+
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX or check it against PyTorch.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="export the model and tokenizer")
+    export.add_argument("--model", default=HF_EMBEDDING_MODEL)
+    export.add_argument("--output", default=ONNX_MODEL_DIR)
+    export.add_argument("--int8", action="store_true", help="also write a dynamically int8-quantised model")
+    check = commands.add_parser("check", help="compare ONNX embeddings with the PyTorch model")
+    check.add_argument("--int8", action="store_true", default=ONNX_INT8, help="check the int8 model")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_model(args.model, args.output, args.int8)
+    else:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        reference = HuggingFaceEmbeddings(
+            model_name=HF_EMBEDDING_MODEL, model_kwargs={"device": "cpu"},
+            encode_kwargs={"batch_size": EMBEDDING_BATCH_SIZE},
+        )
+        candidate = OnnxEmbeddings(ONNX_MODEL_DIR, args.int8, EMBEDDING_BATCH_SIZE, ONNX_THREADS, ONNX_MAX_SEQ_LENGTH)
+        print(json.dumps(check_agreement(reference, candidate, _sample_texts()), indent=2))
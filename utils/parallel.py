@@ -0,0 +1,26 @@
+import asyncio
+import functools
+from langchain_core.runnables import RunnableConfig
+from config import AGENT_TIMEOUT_SECONDS
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def with_timeout(agent, output_key, timeout=AGENT_TIMEOUT_SECONDS):
+    """Wrap an async specialist agent so a slow branch cannot stall the fan-out.
+
+    If the agent does not finish within ``timeout`` seconds it is cancelled and
+    ``output_key`` is set to an empty list so the synthesizer can still answer
+    from the other branches; the timeout is reported in ``errors``.
+    """
+
+    @functools.wraps(agent)
+    async def wrapper(state, config: RunnableConfig = None):
+        try:
+            return await asyncio.wait_for(agent(state, config=config), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("%s timed out after %.1fs; continuing without it.", agent.__name__, timeout)
+            return {output_key: [], "errors": [f"{agent.__name__}: timed out after {timeout:.1f}s"]}
+
+    return wrapper
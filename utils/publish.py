@@ -0,0 +1,61 @@
+import os
+import shutil
+import uuid
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+# Names the published version inside an artifact directory
+POINTER = "CURRENT"
+
+
+def staging_dir(directory: str) -> str:
+    """A fresh, hidden directory inside ``directory`` to build the next version into."""
+    staging = os.path.join(directory, f".staging-{uuid.uuid4().hex[:12]}")
+    if os.path.islink(directory):
+        # Snapshots used to be published through a symlink; the pointer file replaces it
+        target = os.path.realpath(directory)
+        os.remove(directory)
+        shutil.rmtree(target, ignore_errors=True)
+    os.makedirs(staging)
+    return staging
+
+
+def publish(directory: str, staging: str) -> str:
+    """Make the fully written ``staging`` directory the current version of ``directory``.
+
+    The version is switched by replacing the ``CURRENT`` pointer file, a
+    single atomic rename on POSIX and Windows alike, so readers see either
+    the old or the new version in full. Older versions, and files of the
+    unversioned layout, are deleted afterwards; where that fails because a
+    reader still maps them (Windows), the next publish retries.
+    """
+    version = os.path.basename(staging)[len(".staging-"):]
+    os.rename(staging, os.path.join(directory, version))
+    pointer = os.path.join(directory, f".{POINTER}-{version}")
+    with open(pointer, "w", encoding="utf8") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(directory, POINTER))
+
+    for name in os.listdir(directory):
+        # Hidden entries are other builders' work in progress
+        if name in (POINTER, version) or name.startswith("."):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError as e:
+            logger.debug(f"Could not remove superseded {path}: {e}")
+    return os.path.join(directory, version)
+
+
+def current_dir(directory: str) -> str:
+    """Directory holding the published version of ``directory``; ``directory`` itself for the unversioned layout."""
+    try:
+        with open(os.path.join(directory, POINTER), "r", encoding="utf8") as f:
+            return os.path.join(directory, f.read().strip())
+    except OSError:
+        return directory
@@ -0,0 +1,121 @@
+import asyncio
+import time
+from typing import Any, Dict
+from uuid import UUID
+from langchain_core.callbacks import AsyncCallbackHandler
+from logger_util import setup_logger
+from utils.context_packer import count_tokens
+
+logger = setup_logger(__name__)
+
+# Completion tokens reserved per call before the real usage is known.
+ESTIMATED_COMPLETION_TOKENS = 512
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at ``per_minute / 60`` per second.
+
+    Waiters are served in arrival order. ``adjust`` may push the balance
+    negative, which later callers pay off by waiting longer.
+    """
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        """Charge (positive) or refund (negative) ``amount`` outside of ``acquire``."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budget shared by all LLM calls."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.resume_at = 0.0
+
+    async def acquire(self, estimated_tokens: int):
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self.requests.acquire(1)
+        await self.tokens.acquire(estimated_tokens)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int):
+        self.tokens.adjust(actual_tokens - estimated_tokens)
+
+    def pause(self, seconds: float):
+        """Hold back every caller for ``seconds``, e.g. after a 429."""
+        self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+        logger.warning(f"Rate limited by the API; pausing new LLM calls for {seconds:.1f}s")
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429 or "429" in str(error) or "rate limit" in str(error).lower()
+
+
+def retry_after_seconds(error: BaseException, default: float) -> float:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", default))
+    except (TypeError, ValueError):
+        return default
+
+
+class RateLimitCallbackHandler(AsyncCallbackHandler):
+    """Gates every chat-model call of one query on a shared ``RateLimiter``.
+
+    The token estimate reserved at call start is corrected with the reported
+    usage when the call ends; ``rate_limited`` records whether any call of
+    the query hit a 429 so the caller can retry it.
+    """
+
+    run_inline = True
+
+    def __init__(self, limiter: RateLimiter, backoff_seconds: float = 10.0):
+        self.limiter = limiter
+        self.backoff_seconds = backoff_seconds
+        self.rate_limited = False
+        self.retry_after = 0.0
+        self._estimates: Dict[UUID, int] = {}
+
+    async def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, **kwargs):
+        prompt = "\n".join(str(m.content) for batch in messages for m in batch)
+        estimate = count_tokens(prompt) + ESTIMATED_COMPLETION_TOKENS
+        self._estimates[run_id] = estimate
+        await self.limiter.acquire(estimate)
+
+    async def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        estimate = self._estimates.pop(run_id, 0)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage.get("total_tokens"):
+            self.limiter.reconcile(estimate, usage["total_tokens"])
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._estimates.pop(run_id, None)
+        if is_rate_limit_error(error):
+            self.rate_limited = True
+            self.retry_after = retry_after_seconds(error, self.backoff_seconds)
+            self.limiter.pause(self.retry_after)
@@ -0,0 +1,32 @@
+import re
+from typing import List
+
+# "Article 21", "Art. 370", "Articles 14, 19 and 21", "article 21A", "Article 19(1)(a)"
+_ARTICLE_LIST = re.compile(
+    r"\b(?:articles?|arts?\.?)\s*"
+    r"(\d{1,3}[a-z]{0,2}(?:\s*\(\w{1,4}\))*(?:\s*(?:,|and|&|or|to)\s*\d{1,3}[a-z]{0,2}(?:\s*\(\w{1,4}\))*)*)",
+    re.IGNORECASE,
+)
+_ARTICLE_ID = re.compile(r"(?<![\w(])(\d{1,3})([a-z]{0,2})(?![\w)])(?:\s*\((\d{1,2}[a-z]?)\))?", re.IGNORECASE)
+
+
+def normalize_article_id(number: str, suffix: str = "") -> str:
+    """Canonical article identifier, e.g. ``("21", "a") -> "21A"``."""
+    return f"{int(number)}{suffix.upper()}"
+
+
+def extract_article_refs(text: str, clauses: bool = False) -> List[str]:
+    """Article identifiers explicitly named in ``text``, in order, without duplicates.
+
+    Clause qualifiers are dropped, so "Article 19(1)(a)" yields ``["19"]``;
+    with ``clauses=True`` the first numbered clause is kept (``["19(1)"]``).
+    """
+    refs = []
+    for match in _ARTICLE_LIST.finditer(text):
+        for number, suffix, clause in _ARTICLE_ID.findall(match.group(1)):
+            article_id = normalize_article_id(number, suffix)
+            if clauses and clause:
+                article_id = f"{article_id}({clause.upper()})"
+            if article_id not in refs:
+                refs.append(article_id)
+    return refs
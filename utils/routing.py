@@ -1,12 +1,25 @@
+from config import ROUTING_MODE
 from graph_state import GraphState
 
+# Maps each RouterOutput flag to the graph node it activates, in priority order.
+ROUTE_FLAGS = {
+    "route_to_article_search": "article_search",
+    "route_to_case_law": "case_law",
+    "route_to_historical_context": "historical_context",
+}
+
+
 def route_decision(state: GraphState):
+    """Pick the node(s) to run after the router.
+
+    In ``fanout`` mode every selected agent is returned so LangGraph runs them
+    as parallel branches; ``single`` keeps the original first-match behaviour.
+    """
     decision = state["routing_decision"]
-    if decision.get("route_to_article_search"):
-        return "article_search"
-    elif decision.get("route_to_case_law"):
-        return "case_law"
-    elif decision.get("route_to_historical_context"):
-        return "historical_context"
-    else:
+    selected = [node for flag, node in ROUTE_FLAGS.items() if decision.get(flag)]
+
+    if not selected:
         return "synthesizer"
+    if ROUTING_MODE == "single":
+        return selected[0]
+    return selected
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class _Flight:
+    def __init__(self):
+        self.tokens = []
+        self.listeners = []
+        self.task = None
+
+
+class SingleFlight:
+    """Shares one in-progress execution among concurrent calls with the same key.
+
+    The first caller for a key starts ``fn`` as a task; callers arriving
+    while it runs join it instead of starting their own. Every caller,
+    including the first, receives the tokens streamed so far and then the
+    rest as they arrive, followed by the same result (or exception). The
+    task is not cancelled when a caller goes away, so the others still get
+    their answer. Keys are forgotten as soon as the execution finishes;
+    finished results are the answer cache's business. Flights are tied to
+    the event loop that started them, so each loop should use its own
+    instance for concurrent callers.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self.counts = {"executions": 0, "coalesced": 0}
+        self._lock = threading.Lock()
+
+    async def run(self, key, fn, on_token=None):
+        """``(result, joined)``: the result of ``fn`` for ``key``, and whether an identical call was joined.
+
+        ``fn`` is an async callable taking the token callback to stream through.
+        """
+        flight = self._flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._execute(key, flight, fn))
+        with self._lock:
+            self.counts["executions" if leader else "coalesced"] += 1
+        if not leader:
+            logger.info(f"Joined in-flight execution of an identical query ({len(flight.listeners)} waiting)")
+
+        tokens = asyncio.Queue()
+        for token in flight.tokens:
+            tokens.put_nowait(token)
+        flight.listeners.append(tokens)
+        try:
+            while (token := await tokens.get()) is not None:
+                if on_token:
+                    await on_token(token)
+            return flight.task.result(), not leader
+        finally:
+            flight.listeners.remove(tokens)
+
+    async def _execute(self, key, flight, fn):
+        async def broadcast(token):
+            flight.tokens.append(token)
+            for listener in flight.listeners:
+                listener.put_nowait(token)
+
+        try:
+            return await fn(broadcast)
+        finally:
+            self._flights.pop(key, None)
+            for listener in flight.listeners:
+                listener.put_nowait(None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = sum(self.counts.values())
+            return dict(self.counts, hit_rate=self.counts["coalesced"] / total if total else 0.0)
@@ -0,0 +1,104 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_ROUTER_REPLY = json.dumps({
+    "route_to_article_search": True,
+    "route_to_case_law": True,
+    "route_to_historical_context": True,
+    "reasoning": "Stand-in LLM routes every query to all agents.",
+})
+_ANSWER_REPLY = (
+    "This is a stand-in answer generated without calling an LLM. It has roughly the length of a short "
+    "real answer so that streaming and token accounting behave realistically during benchmarks."
+)
+
+
+class FakeChatModel(BaseChatModel):
+    """Stand-in for the Groq chat model (``LLM_BACKEND=fake``) that answers after a fixed latency.
+
+    Router prompts (those asking for the routing JSON schema) get a valid
+    routing decision; every other prompt gets a canned answer, streamed
+    word by word with the latency spread across the tokens.
+    """
+
+    latency_seconds: float = 0.5
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        prompt = "\n".join(str(m.content) for m in messages)
+        return _ROUTER_REPLY if "route_to_article_search" in prompt else _ANSWER_REPLY
+
+    def _result(self, messages: List[BaseMessage], reply: str) -> ChatResult:
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(reply) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=reply))],
+            llm_output={"token_usage": usage, "model_name": self._llm_type},
+        )
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency_seconds)
+        return self._result(messages, self._reply(messages))
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency_seconds)
+        return self._result(messages, self._reply(messages))
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        tokens = re.split(r"(\s)", self._reply(messages))
+        for token in tokens:
+            time.sleep(self.latency_seconds / len(tokens))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = re.split(r"(\s)", self._reply(messages))
+        for token in tokens:
+            await asyncio.sleep(self.latency_seconds / len(tokens))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class HashingEmbeddings(Embeddings):
+    """Stand-in embedder (``EMBEDDINGS_BACKEND=hash``): feature hashing over word unigrams and bigrams.
+
+    Shares vocabulary-level similarity with real embeddings (texts with the
+    same words land close together) at a negligible, model-free cost.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> List[float]:
+        words = re.findall(r"\w+", text.lower())
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
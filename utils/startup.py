@@ -0,0 +1,31 @@
+import time
+from contextlib import contextmanager
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+# Reference point for the report: config imports this module before anything heavy
+_origin = time.perf_counter()
+_phases = []
+
+
+@contextmanager
+def startup_phase(name: str):
+    """Time one startup step (a deferred import, provider construction, index load) for the report."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, time.perf_counter() - start))
+
+
+def startup_report() -> str:
+    """Recorded phases in the order they ran, with the time elapsed since config was first imported."""
+    lines = [f"Startup report ({time.perf_counter() - _origin:.3f}s since config import):"]
+    for name, seconds in _phases:
+        lines.append(f"  {name:<20} {seconds:8.3f}s")
+    return "\n".join(lines)
+
+
+def log_startup_report():
+    logger.info(startup_report())
@@ -0,0 +1,193 @@
+import json
+import mmap
+import os
+from typing import Any, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from logger_util import setup_logger
+from utils.publish import current_dir, publish, staging_dir
+
+logger = setup_logger(__name__)
+
+# Rows scored per block in ``top_rows``; bounds the float32 copy of an int8 matrix
+SCORE_BLOCK_ROWS = 4096
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantisation: ``vectors ~= codes * scales[:, None]``."""
+    scales = np.abs(vectors).max(axis=1) / 127.0 if vectors.size else np.zeros(len(vectors))
+    scales = np.where(scales == 0, 1.0, scales).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+class VectorSnapshot(VectorStore):
+    """Read-only, memory-mapped flat vector store exported from Chroma.
+
+    ``vectors.npy`` holds unit-normalised embeddings in row order, either as
+    float32 or, with ``quantization="int8"``, as int8 codes with per-row
+    scales in ``scales.npy`` (a quarter of the size, slightly approximate
+    scores). ``records.bin``/``offsets.npy`` hold the matching
+    ``{"text", "metadata"}`` JSON records; ``meta.json`` lists the chunk IDs,
+    the quantisation and the ``corpus_version``. Everything is opened with
+    ``mmap`` so worker processes share the same page cache instead of each
+    loading a private copy. Search is an exact dot product over the whole
+    matrix, batched across queries and done in row blocks, which at a few
+    thousand chunks costs less than an approximate index lookup.
+    """
+
+    def __init__(self, directory: str, embedding: Embeddings):
+        self.directory = directory
+        self._embedding = embedding
+        # Resolve the published version once so a concurrent rebuild cannot mix files from two snapshots
+        directory = current_dir(directory)
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf8") as f:
+            meta = json.load(f)
+        self.corpus_version = meta["corpus_version"]
+        self.quantization = meta.get("quantization")
+        self.chunk_ids = meta["chunk_ids"]
+        self.rows = {chunk_id: row for row, chunk_id in enumerate(self.chunk_ids)}
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        self.scales = (
+            np.load(os.path.join(directory, "scales.npy"), mmap_mode="r") if self.quantization == "int8" else None
+        )
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+
+        self._file = open(os.path.join(directory, "records.bin"), "rb")
+        self._records = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.chunk_ids else b""
+        )
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @classmethod
+    def build(cls, vectorstore, directory: str, corpus_version: str, embedding: Embeddings, quantization=None):
+        """Export every chunk and its stored embedding from ``vectorstore`` into ``directory``.
+
+        Files are written to a fresh version directory that is then published
+        atomically (see ``utils.publish``), so processes that still map the
+        previous snapshot keep reading consistent data.
+        """
+        stored = vectorstore.get(include=["embeddings", "documents", "metadatas"])
+        vectors = np.asarray(stored["embeddings"] if stored["ids"] else np.zeros((0, 0)), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+
+        offsets = np.zeros(len(stored["ids"]) + 1, dtype=np.int64)
+        staging = staging_dir(directory)
+        with open(os.path.join(staging, "records.bin"), "wb") as f:
+            for i, (text, metadata) in enumerate(zip(stored["documents"], stored["metadatas"])):
+                data = json.dumps({"text": text, "metadata": metadata or {}}, ensure_ascii=False).encode("utf-8")
+                f.write(data)
+                offsets[i + 1] = offsets[i] + len(data)
+        if quantization == "int8":
+            vectors, scales = quantize_int8(vectors)
+            np.save(os.path.join(staging, "scales.npy"), scales)
+        np.save(os.path.join(staging, "vectors.npy"), vectors)
+        np.save(os.path.join(staging, "offsets.npy"), offsets)
+        with open(os.path.join(staging, "meta.json"), "w", encoding="utf8") as f:
+            json.dump({"corpus_version": corpus_version, "quantization": quantization, "chunk_ids": list(stored["ids"])}, f)
+
+        publish(directory, staging)
+        logger.info(f"Built vector snapshot: {vectors.shape[0]} chunks x {vectors.shape[1]} dims ({vectors.dtype})")
+        return cls(directory, embedding)
+
+    @classmethod
+    def load(cls, directory: str, embedding: Embeddings):
+        if not os.path.exists(os.path.join(current_dir(directory), "meta.json")):
+            return None
+        return cls(directory, embedding)
+
+    def _document(self, row: int) -> Document:
+        record = json.loads(self._records[int(self.offsets[row]):int(self.offsets[row + 1])])
+        return Document(page_content=record["text"], metadata=record["metadata"], id=self.chunk_ids[row])
+
+    def top_rows(self, query_vectors, k: int) -> List[List[Tuple[int, float]]]:
+        """Exact top-``k`` ``(row, cosine)`` pairs for each row of ``query_vectors``.
+
+        The matrix is scored in blocks of ``SCORE_BLOCK_ROWS`` rows against all
+        queries at once, keeping a running top-``k``, so only one block is ever
+        converted to float32.
+        """
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        if not self.chunk_ids:
+            return [[] for _ in queries]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1.0, norms)
+        k = min(k, len(self.chunk_ids))
+
+        best_scores = np.full((k, queries.shape[0]), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((k, queries.shape[0]), dtype=np.int64)
+        for start in range(0, len(self.chunk_ids), SCORE_BLOCK_ROWS):
+            stop = min(start + SCORE_BLOCK_ROWS, len(self.chunk_ids))
+            scores = np.asarray(self.vectors[start:stop], dtype=np.float32) @ queries.T
+            if self.scales is not None:
+                scores *= self.scales[start:stop, None]
+            scores = np.concatenate([best_scores, scores])
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, stop)[:, None], (stop - start, queries.shape[0]))])
+            top = np.argpartition(-scores, k - 1, axis=0)[:k]
+            best_scores = np.take_along_axis(scores, top, axis=0)
+            best_rows = np.take_along_axis(rows, top, axis=0)
+
+        order = np.argsort(-best_scores, axis=0)
+        best_scores = np.take_along_axis(best_scores, order, axis=0)
+        best_rows = np.take_along_axis(best_rows, order, axis=0)
+        return [
+            [(int(row), float(score)) for row, score in zip(best_rows[:, column], best_scores[:, column])]
+            for column in range(queries.shape[0])
+        ]
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        return [(self._document(row), score) for row, score in self.top_rows(embedding, k)[0]]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k)
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(await self._embedding.aembed_query(query), k)
+
+    def batch_similarity_search(self, queries: List[str], k: int = 4) -> List[List[Document]]:
+        """Search several queries with one embedding batch and one matrix product."""
+        vectors = self._embedding.embed_documents(queries)
+        return [[self._document(row) for row, _ in hits] for hits in self.top_rows(vectors, k)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    def get(self, ids: Optional[List[str]] = None, include=None) -> dict:
+        """Chroma-style ``get`` so callers such as ``HybridRetriever`` can hydrate chunks by ID."""
+        rows = range(len(self.chunk_ids)) if ids is None else [self.rows[i] for i in ids if i in self.rows]
+        docs = [self._document(row) for row in rows]
+        return {
+            "ids": [doc.id for doc in docs],
+            "documents": [doc.page_content for doc in docs],
+            "metadatas": [doc.metadata for doc in docs],
+        }
+
+    def add_texts(self, texts, metadatas=None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError("VectorSnapshot is read-only; index through Chroma and rebuild the snapshot")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs: Any):
+        raise NotImplementedError("Build a VectorSnapshot from an existing vector store with VectorSnapshot.build")
+
+
+def ensure_vector_snapshot(vectorstore, directory: str, corpus_version: str, embedding: Embeddings,
+                           quantization=None) -> VectorSnapshot:
+    """Load the snapshot, re-exporting it from the vector store if the corpus or quantisation changed."""
+    snapshot = VectorSnapshot.load(directory, embedding)
+    if snapshot is not None and (snapshot.corpus_version, snapshot.quantization) == (corpus_version, quantization):
+        return snapshot
+    logger.info("Vector snapshot missing or stale; exporting from the vector store")
+    return VectorSnapshot.build(vectorstore, directory, corpus_version, embedding, quantization)